@@ -1,12 +1,53 @@
+import os
+import json
 import random
+import timeit
+import itertools
+import importlib
 import numpy as np
-import pandas as pd
-import scipy.stats as stats
-import seaborn as sns
-import matplotlib
-import matplotlib.pyplot as plt
-from tqdm import tqdm
-from IPython.core.pylabtools import figsize
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+"""
+    Lazy Imports
+"""
+
+# the plotting and notebook libraries aren't used by the simulation classes, so they're only
+# imported when they're first requested from the module, such as by 'from PowerSocketSystem import *'
+# - each name is given as the module to import and the attribute to take from it, if any
+lazy_imports = {
+  'pd': ('pandas', None),
+  'stats': ('scipy.stats', None),
+  'sns': ('seaborn', None),
+  'matplotlib': ('matplotlib', None),
+  'plt': ('matplotlib.pyplot', None),
+  'tqdm': ('tqdm', 'tqdm'),
+  'figsize': ('IPython.core.pylabtools', 'figsize'),
+}
+
+def __getattr__(name):
+  """ import a plotting or notebook library the first time it's used """
+  if name not in lazy_imports:
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+  module_name, attribute = lazy_imports[name]
+  value = importlib.import_module(module_name)
+  if attribute is not None:
+    value = getattr(value, attribute)
+  
+  # save the value so that it's found directly the next time
+  globals()[name] = value
+  return value
+
+# the names exported by 'from PowerSocketSystem import *', including the lazily imported libraries
+__all__ = ['random', 'timeit', 'np', 'ProcessPoolExecutor', *lazy_imports,
+           'socket_order', 'socket_means', 'NUM_SOCKETS', 'MAX_LOOP_ARGMAX',
+           'random_argmax', 'RandomArgmax', 'benchmark_random_argmax', 'get_tester_settings',
+           'PowerSocket', 'SocketTester', 'BatchSocketTester',
+           'EpsilonGreedyBatchSocketTester', 'UCBBatchSocketTester',
+           'GaussianThompsonBatchSocketTester', 'BernoulliThompsonBatchSocketTester',
+           'RunningStats', 'QuantileSketch', 'save_test_stats', 'load_test_stats', 'get_rng_state', 'set_rng_state',
+           'run_test_chunk', 'SocketExperiment', 'SocketSweep']
 
 """
     System Setup
@@ -34,19 +75,123 @@ np.set_printoptions(formatter={'float': lambda x: "{0:0.3f}".format(x)})
     Helper Functions
 """
 
+# the largest number of values for which random_argmax uses a plain python loop
+# - for a handful of sockets this is much faster than creating numpy arrays
+MAX_LOOP_ARGMAX = 32
+
 # return the index of the largest value in the supplied list
 # - arbitrarily select between the largest values in the case of a tie
 # (the standard np.argmax just chooses the first value in the case of a tie)
-def random_argmax(value_list):
+def random_argmax(value_list, rng=np.random):
   """ a random tie-breaking argmax"""
-  values = np.asarray(value_list)
-  return np.argmax(np.random.random(values.shape) * (values==values.max()))
+  
+  if len(value_list) > MAX_LOOP_ARGMAX:
+    values = np.asarray(value_list)
+    # add the random values to the mask of the largest values, rather than multiplying by it,
+    # so that a largest value can never lose to a smaller one with a zero random value
+    return np.argmax(rng.random(values.shape) + (values==values.max()))
+  
+  # single pass over the values, keeping a uniformly random choice among the largest values seen
+  # - a random number is only needed when there's a tie
+  best_index = 0
+  best_value = value_list[0]
+  ties = 1
+  for index, value in enumerate(value_list):
+    if value > best_value:
+      best_index = index
+      best_value = value
+      ties = 1
+    elif value == best_value and index > 0:
+      ties += 1
+      if rng.random() * ties < 1: 
+        best_index = index
+  return best_index
+
+
+class RandomArgmax():
+  """ a random tie-breaking argmax over each row of a (tests, arms) array of values
+  
+      - the work arrays are allocated once, for the maximum number of tests, and reused by every call
+      - the returned array of indices is also reused, so is only valid until the next call
+  """
+  
+  def __init__(self, number_of_tests, number_of_arms):
+    self.maximum = np.empty((number_of_tests, 1))
+    self.ties = np.empty((number_of_tests, number_of_arms), dtype=bool)
+    self.noise = np.empty((number_of_tests, number_of_arms))
+    self.index = np.empty(number_of_tests, dtype=np.intp)
+    
+  def __call__(self, values, rng):
+    """ return the index of the largest value in each row, using the supplied numpy Generator 
+        to choose between the largest values of a row in the case of a tie """
+    
+    # only use the start of each buffer when fewer tests are supplied
+    rows = values.shape[0]
+    maximum = self.maximum[:rows]
+    ties = self.ties[:rows]
+    noise = self.noise[:rows]
+    
+    # random values in [0,1) are added to a mask of the largest values, so each of these has 
+    # a value in [1,2) and the argmax is a uniformly random choice between them
+    np.max(values, axis=1, keepdims=True, out=maximum)
+    np.equal(values, maximum, out=ties)
+    rng.random(out=noise)
+    noise += ties
+    return np.argmax(noise, axis=1, out=self.index[:rows])
+  
+  
+def benchmark_random_argmax(number_of_calls = 100000, number_of_arms = 5, number_of_tests = 1000):
+  """ time the tie-breaking argmax functions against the original array based implementation """
+  
+  def original_random_argmax(value_list):
+    values = np.asarray(value_list)
+    return np.argmax(np.random.random(values.shape) * (values==values.max()))
+  
+  def original_random_argmax_rows(values):
+    return np.argmax(np.random.random(values.shape) * (values==values.max(axis=1, keepdims=True)), axis=1)
+  
+  # values with a two-way tie for the largest value
+  value_list = [float(i % (number_of_arms-1)) for i in range(number_of_arms)]
+  value_array = np.tile(value_list, (number_of_tests, 1))
+  argmax = RandomArgmax(number_of_tests, number_of_arms)
+  rng = np.random.default_rng()
+  
+  number_of_rows = max(1, number_of_calls//number_of_tests)
+  timings = {
+    'original_random_argmax': timeit.timeit(lambda: original_random_argmax(value_list), number=number_of_calls),
+    'random_argmax': timeit.timeit(lambda: random_argmax(value_list), number=number_of_calls),
+    'original_random_argmax_rows': timeit.timeit(lambda: original_random_argmax_rows(value_array), number=number_of_rows),
+    'RandomArgmax': timeit.timeit(lambda: argmax(value_array, rng), number=number_of_rows),
+  }
+  
+  print(f"{number_of_calls} calls with {number_of_arms} values: "
+        f"{timings['original_random_argmax']:0.3f}s -> {timings['random_argmax']:0.3f}s "
+        f"({timings['original_random_argmax']/timings['random_argmax']:0.1f}x)")
+  print(f"{number_of_rows} calls with ({number_of_tests},{number_of_arms}) values: "
+        f"{timings['original_random_argmax_rows']:0.3f}s -> {timings['RandomArgmax']:0.3f}s "
+        f"({timings['original_random_argmax_rows']/timings['RandomArgmax']:0.1f}x)")
+  return timings
+
+
+
+def get_tester_settings(tester, **settings):
+  """ the settings of a socket tester, given by its class, any number, string or flag attribute
+      that isn't one of its 'run_attributes' and the other supplied settings, in name order """
+  
+  tester_settings = {name: value for name, value in vars(tester).items()
+                     if isinstance(value, (bool, int, float, str)) and name not in tester.run_attributes}
+  tester_settings['class'] = type(tester).__qualname__
+  tester_settings.update(settings)
+  return dict(sorted(tester_settings.items()))
 
 
 
 class PowerSocket:
     """ the base power socket class """
     
+    # the source of random numbers, by default numpy's global random state
+    rng = np.random
+    
     def __init__(self, q):                
         self.q = q        # the true reward value              
         self.initialize() # reset the socket
@@ -60,7 +205,7 @@ class PowerSocket:
         
         # the reward is a guassian distribution with unit variance around the true
         # value 'q'
-        value = np.random.randn() + self.q        
+        value = self.rng.standard_normal() + self.q        
         
         # never allow a charge less than 0 to be returned        
         return 0 if value < 0 else value
@@ -83,10 +228,22 @@ class PowerSocket:
 class SocketTester():
     """ create and test a set of sockets over a single test run """
 
-    def __init__(self, socket=PowerSocket, socket_order=socket_order, multiplier=2, **kwargs ):  
-        
-        # create supplied socket type with a mean value defined by socket order 
-        self.sockets = [socket((q*multiplier)+2, **kwargs) for q in socket_order]     
+    # the source of random numbers, by default numpy's global random state
+    rng = np.random
+    
+    # the per-timestep buffers, allocated by the first run
+    socket_stats = None
+
+    # the values set on the tester by each run, which aren't part of its settings
+    run_attributes = ('number_of_steps', 'total_steps', 'total_reward', 'number_of_rewards')
+
+    def __init__(self, socket=PowerSocket, socket_order=socket_order, multiplier=2, **kwargs ):
+
+        # the arguments that every socket is created with
+        self.socket_kwargs = dict(kwargs)
+
+        # create supplied socket type with a mean value defined by socket order
+        self.sockets = [socket((q*multiplier)+2, **kwargs) for q in socket_order]
         
         # set the number of sockets equal to the number created
         self.number_of_sockets = len(self.sockets)           
@@ -99,6 +256,25 @@ class SocketTester():
         self.number_of_stats = kwargs.pop('number_of_stats', 2)       
              
             
+    def get_settings(self):
+        """ the parameters that define the tester, such as its socket type and values and any number,
+            string or flag set on it (e.g. epsilon), but not the counters of a run """
+        return get_tester_settings(self,
+                                   socket = type(self.sockets[0]).__qualname__,
+                                   q = [socket.q for socket in self.sockets],
+                                   socket_kwargs = self.socket_kwargs)
+
+    def set_rng(self, rng):
+        """ set the random number generator used by the tester and all of its sockets
+            - None, or the numpy random module itself, goes back to numpy's global random state """
+        if rng is None or rng is np.random:
+            # remove the instance generators so the class default is used, rather than storing
+            # the module, which can't be pickled to send the tester to a worker process
+            for item in [self, *self.sockets]: vars(item).pop('rng', None)
+            return
+        self.rng = rng
+        for socket in self.sockets: socket.rng = rng
+            
     def initialize_run(self, number_of_steps):
         """ reset counters at the start of a run """
         
@@ -111,17 +287,27 @@ class SocketTester():
         # monitor the total reward obtained over the run
         self.total_reward = 0
         
-        # the current total reward at each timestep of the run
-        self.total_reward_per_timestep = []
+        # the number of timesteps for which a reward has been recorded
+        # - a run that stops early only fills the start of the timestep buffers
+        self.number_of_rewards = 0
         
-        # the actual reward obtained at each timestep
-        self.reward_per_timestep = []
-           
-        # stats for each time-step
-        # - by default records: estimate, number of trials
-        self.socket_stats = np.zeros(shape=(number_of_steps+1, 
-                                            self.number_of_sockets, 
-                                            self.number_of_stats))
+        # the buffers are only allocated when the number of steps changes, 
+        # otherwise the ones from the previous run are reused
+        if self.socket_stats is None or self.socket_stats.shape[0] != (number_of_steps+1):
+        
+            # the current total reward at each timestep of the run
+            self.total_reward_per_timestep = np.zeros(number_of_steps)
+            
+            # the actual reward obtained at each timestep
+            self.reward_per_timestep = np.zeros(number_of_steps)
+               
+            # stats for each time-step
+            # - by default records: estimate, number of trials
+            self.socket_stats = np.zeros(shape=(number_of_steps+1, 
+                                                self.number_of_sockets, 
+                                                self.number_of_stats))
+        else:
+            self.socket_stats.fill(0)
         
         # ensure that all sockets are re-initialized
         for socket in self.sockets: socket.initialize()
@@ -138,10 +324,11 @@ class SocketTester():
         self.total_reward += reward   
         
         # store the current total reward at this timestep
-        self.total_reward_per_timestep.append(self.total_reward)
+        self.total_reward_per_timestep[self.number_of_rewards] = self.total_reward
         
         # store the reward obtained at this timestep
-        self.reward_per_timestep.append(reward)        
+        self.reward_per_timestep[self.number_of_rewards] = reward
+        self.number_of_rewards += 1
         
         
     def get_socket_stats( self, t ):
@@ -153,21 +340,31 @@ class SocketTester():
         """ the total reward averaged over the number of time steps """
         return (self.total_reward/self.total_steps)
     
+    def get_run_buffers( self ):
+        """ the cumulative total reward, reward, estimates and number of trials at each timestep of the run,
+            as views of the run buffers, which are only valid until the next run """
+        return (self.total_reward_per_timestep[:self.number_of_rewards],
+                self.reward_per_timestep[:self.number_of_rewards],
+                self.socket_stats[:,:,0],
+                self.socket_stats[:,:,1])
+    
+    # the results are copied out of the run buffers, which are reused and cleared by the next run
+    
     def get_total_reward_per_timestep( self ):
         """ the cumulative total reward at each timestep of the run """
-        return self.total_reward_per_timestep
+        return self.total_reward_per_timestep[:self.number_of_rewards].copy()
     
     def get_reward_per_timestep( self ):
         """ the actual reward obtained at each timestep of the run """
-        return self.reward_per_timestep
+        return self.reward_per_timestep[:self.number_of_rewards].copy()
     
     def get_estimates(self):
         """ get the estimate of each socket's reward at each timestep of the run """
-        return self.socket_stats[:,:,0]  
+        return self.socket_stats[:,:,0].copy()
     
     def get_number_of_trials(self):
         """ get the number of trials of each socket at each timestep of the run """
-        return self.socket_stats[:,:,1]          
+        return self.socket_stats[:,:,1].copy()
                 
     def get_socket_percentages( self ):
         """ get the percentage of times each socket was tried over the run """
@@ -188,7 +385,7 @@ class SocketTester():
         
         # choose the socket with the current highest mean reward or arbitrarily
         # select a socket in the case of a tie            
-        socket_index = random_argmax([socket.sample(t+1) for socket in self.sockets]) 
+        socket_index = random_argmax([socket.sample(t+1) for socket in self.sockets], self.rng) 
         return socket_index     
     
     
@@ -223,6 +420,611 @@ class SocketTester():
         
         return self.total_steps, self.total_reward
   
+
+
+class BatchSocketTester():
+    """ create and test a set of sockets over a batch of independent test runs at once
+
+        - the state of every test is held in (tests, sockets) arrays so that each
+          timestep of all the runs is performed with a single set of array operations
+    """
+
+    # if set, the rewards of every test are added to this histogram at each timestep
+    reward_sketch = None
+
+    def __init__(self, socket_order=socket_order, multiplier=2, initial_estimate=0., seed=None, **kwargs ):
+
+        # the true reward value of each socket, defined by the socket order
+        self.q = np.array([(q*multiplier)+2 for q in socket_order], dtype=float)
+
+        # set the number of sockets equal to the number created
+        self.number_of_sockets = len(self.q)
+
+        # the index of the best socket is the last in the socket_order list
+        # - this is a one-based value so convert to zero-based
+        self.optimal_socket_index = (socket_order[-1] - 1)
+
+        # the value that each socket's reward estimate starts at
+        self.initial_estimate = initial_estimate
+
+        # by default a socket tester records 2 bits of information over a run
+        self.number_of_stats = kwargs.pop('number_of_stats', 2)
+
+        # the random number generator used to produce all the charges and selections
+        self.rng = np.random.default_rng(seed)
+
+
+    # the values set on the tester by each run, which aren't part of its settings
+    run_attributes = ('number_of_tests', 'number_of_steps')
+
+    def get_settings(self):
+        """ the parameters that define the tester, such as its socket values and any number, string
+            or flag set on it (e.g. epsilon or confidence_level), but not the counters of a run """
+        return get_tester_settings(self, q = self.q.tolist())
+
+    def set_rng(self, rng):
+        """ set the random number generator used to produce all the charges and selections """
+        self.rng = rng
+
+    def initialize_run(self, number_of_tests, number_of_steps):
+        """ reset counters at the start of a batch of runs """
+        
+        # the tie-breaking argmax used to select the sockets
+        # - this is only recreated when the number of tests changes
+        if getattr(self, 'number_of_tests', None) != number_of_tests:
+            self.argmax = RandomArgmax(number_of_tests, self.number_of_sockets)
+
+        # save the number of tests and the number of steps over which each run will take place
+        self.number_of_tests = number_of_tests
+        self.number_of_steps = number_of_steps
+
+        # the estimate of each socket's reward value and the number of times it has been tried
+        self.Q = np.full((number_of_tests, self.number_of_sockets), float(self.initial_estimate))
+        self.n = np.zeros((number_of_tests, self.number_of_sockets))
+
+        # the actual number of steps that each test ran for
+        self.total_steps = np.zeros(number_of_tests, dtype=int)
+
+        # the total reward obtained over each run
+        self.total_reward = np.zeros(number_of_tests)
+
+        # the socket selected at the last step of each run
+        self.last_socket = np.zeros(number_of_tests, dtype=int)
+
+        # the total reward and actual reward at each timestep, summed over all runs
+        self.total_reward_per_timestep = np.zeros(number_of_steps)
+        self.reward_per_timestep = np.zeros(number_of_steps)
+
+        # stats for each time-step, summed over all runs
+        # - by default records: estimate, number of trials
+        self.socket_stats = np.zeros(shape=(number_of_steps+1,
+                                            self.number_of_sockets,
+                                            self.number_of_stats))
+
+        # the sum of squared deviations from the mean of the per-timestep values over all runs, from which
+        # their variance is found - these are calculated from the deviations of each timestep's values,
+        # rather than from the sums of their squares, which lose their precision when the variance is small
+        self.total_reward_per_timestep_m2 = np.zeros(number_of_steps)
+        self.reward_per_timestep_m2 = np.zeros(number_of_steps)
+        self.socket_stats_m2 = np.zeros_like(self.socket_stats)
+
+
+    def charge(self, tests, socket_index):
+        """ return a random amount of charge from the chosen socket of each test """
+
+        # the reward is a guassian distribution with unit variance around the true value 'q'
+        rewards = self.rng.standard_normal(len(tests)) + self.q[socket_index]
+
+        # never allow a charge less than 0 to be returned
+        return np.maximum(rewards, 0, out=rewards)
+
+    def update(self, tests, socket_index, rewards):
+        """ update the chosen socket of each test after it has returned the reward values """
+
+        # increment the number of times each chosen socket has been tried
+        self.n[tests, socket_index] += 1
+        n = self.n[tests, socket_index]
+
+        # the new estimate of the mean is calculated from the old estimate
+        self.Q[tests, socket_index] = (1 - 1.0/n) * self.Q[tests, socket_index] + (1.0/n) * rewards
+
+    def charge_and_update(self, tests, socket_index):
+        """ charge from & update the specified socket of each test and the associated parameters """
+
+        # charge from the chosen sockets and update their mean reward values
+        rewards = self.charge(tests, socket_index)
+        self.update(tests, socket_index, rewards)
+
+        # update the total reward of each test and remember the socket that was chosen
+        self.total_reward[tests] += rewards
+        self.last_socket[tests] = socket_index
+        return rewards
+
+
+    def get_socket_stats( self, t ):
+        """ get the current information from each socket, summed over all runs """
+        return np.stack((self.Q.sum(axis=0), self.n.sum(axis=0)), axis=-1)
+
+    def get_m2( self, values ):
+        """ get the sum of squared deviations from the mean of the values of the runs, given along the first axis
+            - runs that have already finished, and aren't included in the values, are counted as a value of zero """
+        mean = values.sum(axis=0) / self.number_of_tests
+        deviations = values - mean
+        return np.einsum('i...,i...->...', deviations, deviations) + (self.number_of_tests - len(values)) * mean**2
+
+    def get_socket_stats_m2( self, t ):
+        """ get the sum of squared deviations from the mean of the current information from each socket over all runs """
+        return np.stack((self.get_m2(self.Q), self.get_m2(self.n)), axis=-1)
+
+    def get_timestep_moments( self ):
+        """ get the mean, and the sum of squared deviations from the mean, of each per-timestep value over all runs """
+        N = self.number_of_tests
+        return {'cumulative_reward_per_timestep': (self.total_reward_per_timestep/N, self.total_reward_per_timestep_m2),
+                'reward_per_timestep': (self.reward_per_timestep/N, self.reward_per_timestep_m2),
+                'estimates': (self.socket_stats[:,:,0]/N, self.socket_stats_m2[:,:,0]),
+                'number_of_trials': (self.socket_stats[:,:,1]/N, self.socket_stats_m2[:,:,1])}
+
+    def get_mean_reward( self ):
+        """ the total reward of each run averaged over the number of time steps """
+        return (self.total_reward/self.total_steps)
+
+    def get_total_reward_per_timestep( self ):
+        """ the mean cumulative total reward at each timestep of the runs """
+        return self.total_reward_per_timestep/self.number_of_tests
+
+    def get_reward_per_timestep( self ):
+        """ the mean actual reward obtained at each timestep of the runs """
+        return self.reward_per_timestep/self.number_of_tests
+
+    def get_estimates(self):
+        """ get the mean estimate of each socket's reward at each timestep of the runs """
+        return self.socket_stats[:,:,0]/self.number_of_tests
+
+    def get_number_of_trials(self):
+        """ get the mean number of trials of each socket at each timestep of the runs """
+        return self.socket_stats[:,:,1]/self.number_of_tests
+
+    def get_socket_percentages( self ):
+        """ get the percentage of times each socket was tried over each run """
+        return (self.final_trials/self.total_steps[:,np.newaxis])
+
+    def get_optimal_socket_percentage( self ):
+        """ get the percentage of times the optimal socket was tried in each run """
+        return (self.final_trials[:,self.optimal_socket_index]/self.total_steps)
+
+    def get_time_steps( self ):
+        """ get the number of time steps that each test ran for """
+        return self.total_steps
+
+
+    def select_sockets( self, t, tests ):
+        """ Greedy Socket Selection for each of the specified tests """
+
+        # choose the socket with the current highest mean reward or arbitrarily
+        # select a socket in the case of a tie
+        return self.argmax(self.Q[tests], self.rng)
+
+
+    def run( self, number_of_tests, number_of_steps, maximum_total_reward = float('inf')):
+        """ perform a batch of independent runs, over the set of sockets,
+            for the defined number of steps """
+
+        # reset the run counters
+        self.initialize_run(number_of_tests, number_of_steps)
+
+        # the indices of the tests that are still running
+        tests = np.arange(number_of_tests)
+
+        # loop for the specified number of time-steps
+        for t in range(number_of_steps):
+
+            # get information about all sockets at the start of the time step
+            self.socket_stats[t] = self.get_socket_stats(t)
+            self.socket_stats_m2[t] = self.get_socket_stats_m2(t)
+
+            # select a socket for each test
+            socket_index = self.select_sockets(t, tests)
+
+            # charge from the chosen sockets and update their mean reward values
+            rewards = self.charge_and_update(tests, socket_index)
+
+            # store the total reward and the reward obtained at this timestep
+            # - runs that have already finished keep their final total reward
+            self.total_reward_per_timestep[t] = self.total_reward.sum()
+            self.reward_per_timestep[t] = rewards.sum()
+            self.total_reward_per_timestep_m2[t] = self.get_m2(self.total_reward)
+            self.reward_per_timestep_m2[t] = self.get_m2(rewards)
+            if self.reward_sketch is not None:
+                self.reward_sketch.add_step(t, rewards)
+
+            # test if the accumulated total reward of any test is greater than the maximum
+            finished = self.total_reward[tests] > maximum_total_reward
+            if finished.any():
+                self.total_steps[tests[finished]] = t
+                tests = tests[~finished]
+                if len(tests) == 0:
+                    break
+
+        # save the actual number of steps that have been run by the remaining tests
+        self.total_steps[tests] = t
+
+        # runs that finished early keep their final total reward for the remaining timesteps
+        self.total_reward_per_timestep[t+1:] = self.total_reward.sum()
+        self.total_reward_per_timestep_m2[t+1:] = self.get_m2(self.total_reward)
+
+        # get the stats for each socket at the end of the run
+        self.socket_stats[t+1] = self.get_socket_stats(t+1)
+        self.socket_stats_m2[t+1] = self.get_socket_stats_m2(t+1)
+
+        # the trials of each socket at the start of the final step of each run
+        self.final_trials = self.n.copy()
+        self.final_trials[np.arange(number_of_tests), self.last_socket] -= 1
+
+        return self.total_steps, self.total_reward
+  
+
+class EpsilonGreedyBatchSocketTester( BatchSocketTester ):
+    """ a batch socket tester that makes a random selection, in each test, with probability epsilon """
+
+    def __init__(self, socket_order=socket_order, multiplier=2, epsilon=0.2, **kwargs ):
+
+        # create a standard batch socket tester
+        super().__init__(socket_order=socket_order, multiplier=multiplier, **kwargs)
+
+        # save the probability of selecting the non-greedy action
+        self.epsilon = epsilon
+
+    def select_sockets( self, t, tests ):
+        """ Epsilon-Greedy Socket Selection for each of the specified tests """
+
+        # the tests in which a random socket is chosen from the complete set
+        explore = self.rng.random(len(tests)) < self.epsilon
+        random_sockets = self.rng.integers(self.number_of_sockets, size=len(tests))
+
+        # otherwise choose the socket with the current highest mean reward
+        greedy_sockets = self.argmax(self.Q[tests], self.rng)
+        return np.where(explore, random_sockets, greedy_sockets)
+
+
+class UCBBatchSocketTester( BatchSocketTester ):
+    """ a batch socket tester that selects the socket with the highest upper confidence bound in each test """
+
+    def __init__(self, socket_order=socket_order, multiplier=2, confidence_level=2.0, **kwargs ):
+
+        # create a standard batch socket tester
+        super().__init__(socket_order=socket_order, multiplier=multiplier, **kwargs)
+
+        # store the confidence level controlling exploration
+        self.confidence_level = confidence_level
+
+    def uncertainty(self, t, tests):
+        """ calculate the uncertainty in the estimate of each socket's mean, for each of the specified tests
+            - a socket that hasn't been tried has an infinite uncertainty """
+        n = self.n[tests]
+        uncertainty = np.full(n.shape, float('inf'))
+        np.divide(np.log(t), n, out=uncertainty, where=n > 0)
+        np.sqrt(uncertainty, out=uncertainty)
+        uncertainty *= self.confidence_level
+        return uncertainty
+
+    def select_sockets( self, t, tests ):
+        """ choose the socket with the current highest UCB reward for each of the specified tests """
+
+        # the UCB reward is the estimate of the mean reward plus its uncertainty
+        ucb = self.uncertainty(t+1, tests)
+        ucb += self.Q[tests]
+        return self.argmax(ucb, self.rng)
+
+
+class GaussianThompsonBatchSocketTester( BatchSocketTester ):
+    """ a batch socket tester that uses Thompson Sampling, with a Gaussian posterior for each socket """
+
+    def __init__(self, socket_order=socket_order, multiplier=2, initial_precision=0.0001, initial_mean=1., **kwargs ):
+
+        # create a standard batch socket tester
+        super().__init__(socket_order=socket_order, multiplier=multiplier, **kwargs)
+
+        # the initial precision and mean of each socket's posterior
+        self.initial_precision = initial_precision
+        self.initial_mean = initial_mean
+
+    def initialize_run(self, number_of_tests, number_of_steps):
+        """ reset counters and each socket's posterior at the start of a batch of runs """
+        super().initialize_run(number_of_tests, number_of_steps)
+
+        # the posterior precision and mean of each socket in each test
+        self.tau_0 = np.full((number_of_tests, self.number_of_sockets), self.initial_precision)
+        self.mu_0 = np.full((number_of_tests, self.number_of_sockets), self.initial_mean)
+
+    def update(self, tests, socket_index, rewards):
+        """ update the chosen socket of each test after it has returned the reward values """
+
+        # do a standard update of the estimated mean
+        super().update(tests, socket_index, rewards)
+
+        # update the mean and precision of each chosen socket's posterior
+        tau_0 = self.tau_0[tests, socket_index]
+        n = self.n[tests, socket_index]
+        self.mu_0[tests, socket_index] = ((tau_0 * self.mu_0[tests, socket_index]) + (n * self.Q[tests, socket_index]))/(tau_0 + n)
+        self.tau_0[tests, socket_index] = tau_0 + 1
+
+    def select_sockets( self, t, tests ):
+        """ choose the socket with the highest value sampled from its posterior, for each of the specified tests """
+        samples = self.rng.standard_normal((len(tests), self.number_of_sockets))
+        samples /= np.sqrt(self.tau_0[tests])
+        samples += self.mu_0[tests]
+        return self.argmax(samples, self.rng)
+
+
+class BernoulliThompsonBatchSocketTester( BatchSocketTester ):
+    """ a batch socket tester that uses Thompson Sampling on sockets that either do or don't return a charge
+    
+        - each socket returns a charge with a fixed probability, with a Beta posterior over this probability
+        - by default the probabilities follow the socket order, with the best socket having the highest probability
+    """
+
+    def __init__(self, socket_order=socket_order, socket_probabilities=None, **kwargs ):
+
+        # create a standard batch socket tester
+        super().__init__(socket_order=socket_order, **kwargs)
+
+        # the true value of each socket is the probability that it returns a charge
+        if socket_probabilities is None:
+            socket_probabilities = [q/(len(socket_order)+1) for q in socket_order]
+        self.q = np.array(socket_probabilities, dtype=float)
+        self.number_of_sockets = len(self.q)
+        self.optimal_socket_index = int(np.argmax(self.q))
+
+    def initialize_run(self, number_of_tests, number_of_steps):
+        """ reset counters and each socket's posterior at the start of a batch of runs """
+        super().initialize_run(number_of_tests, number_of_steps)
+
+        # the number of times each socket, in each test, has and hasn't returned a charge (plus one)
+        self.alpha = np.ones((number_of_tests, self.number_of_sockets))
+        self.beta = np.ones((number_of_tests, self.number_of_sockets))
+
+    def charge(self, tests, socket_index):
+        """ return some charge from the chosen socket of each test with the socket's predefined probability """
+        return (self.rng.random(len(tests)) < self.q[socket_index]).astype(float)
+
+    def update(self, tests, socket_index, rewards):
+        """ increase the number of times each chosen socket has been used and update the 
+            counts of the number of times it has and has not returned a charge (alpha and beta) """
+        super().update(tests, socket_index, rewards)
+        self.alpha[tests, socket_index] += rewards
+        self.beta[tests, socket_index] += (1-rewards)
+
+    def select_sockets( self, t, tests ):
+        """ choose the socket with the highest value sampled from its beta distribution, for each of the specified tests """
+        return self.argmax(self.rng.beta(self.alpha[tests], self.beta[tests]), self.rng)
+
+
+"""
+    Experiment Statistics
+"""
+
+class RunningStats():
+    """ the count, mean and sum of squared deviations from the mean of a statistic, or of each
+        element of an array of statistics, updated as each value arrives
+
+        - the memory used doesn't depend on the number of values, and the stats from separate
+          sets of values, such as those run by different workers, can be merged
+    """
+
+    # the work array used by each update, allocated by the first update
+    delta = None
+
+    def __init__(self, shape=()):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, value):
+        """ add a single value, using Welford's algorithm
+            - an array that's shorter than the stats is treated as if it was padded with its last value
+            - the stats are updated in place, so no new arrays are created for each value """
+        self.count += 1
+        n = self.count
+        if self.delta is None:
+            self.delta = np.empty_like(self.mean)
+
+        value = np.asarray(value)
+        if value.ndim > 0 and len(value) < len(self.mean):
+            parts = ((slice(0, len(value)), value), (slice(len(value), None), value[-1]))
+        else:
+            parts = ((Ellipsis, value),)
+
+        # with d = (x - mean)/n: the mean increases by d and m2 by (x - old mean)(x - new mean) = d*d*n*(n-1)
+        for index, x in parts:
+            delta = self.delta[index]
+            np.subtract(x, self.mean[index], out=delta)
+            delta /= n
+            self.mean[index] += delta
+            delta *= delta
+            delta *= n * (n-1)
+            self.m2[index] += delta
+
+    def update_batch(self, values):
+        """ add a batch of values, given along the first axis of the supplied array """
+        values = np.asarray(values, dtype=float)
+        mean = values.mean(axis=0)
+        self.add(values.shape[0], mean, ((values - mean)**2).sum(axis=0))
+
+    def add(self, count, mean, m2):
+        """ combine the stats of a separate set of 'count' values with the current stats """
+        if count == 0: return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * (count / total)
+        self.m2 += m2 + (delta**2) * (self.count * count / total)
+        self.count = total
+
+    def merge(self, other):
+        """ combine the stats from another set of values with the current stats """
+        self.add(other.count, other.mean, other.m2)
+
+    def get_mean(self):
+        """ the mean of the values, as a scalar for a single statistic """
+        return self.mean[()]
+
+    def get_variance(self):
+        """ the sample variance of the values, or nan if there are fewer than 2 values """
+        if self.count < 2: return np.full_like(self.mean, np.nan)[()]
+        return (self.m2 / (self.count - 1))[()]
+
+    def get_standard_error(self):
+        """ the standard error of the mean """
+        return np.sqrt(self.get_variance() / max(self.count, 1))
+
+    def get_half_width(self, confidence=0.95):
+        """ half the width of the normal confidence interval of the mean """
+        return NormalDist().inv_cdf(0.5 + confidence/2) * self.get_standard_error()
+
+    def get_confidence_interval(self, confidence=0.95):
+        """ the lower and upper limits of the normal confidence interval of the mean """
+        half_width = self.get_half_width(confidence)
+        return self.get_mean() - half_width, self.get_mean() + half_width
+
+
+class QuantileSketch():
+    """ the approximate distribution of the values at each timestep, held as a fixed set of histogram bins
+
+        - values outside the range of the bins are counted in the first or last bin
+        - the memory used only depends on the number of timesteps and bins, and sketches are merged
+          by adding their counts
+    """
+
+    def __init__(self, number_of_steps, low, high, bins=100):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.bin_width = (high - low) / bins
+        self.counts = np.zeros((number_of_steps, bins), dtype=np.int64)
+
+    def get_bins(self, values):
+        """ the index of the bin that each value falls in """
+        bins = np.floor((np.asarray(values) - self.low) / self.bin_width).astype(np.intp)
+        return np.clip(bins, 0, self.bins-1, out=bins)
+
+    def add_step(self, t, values):
+        """ add the values from all runs at a single timestep """
+        self.counts[t] += np.bincount(self.get_bins(values), minlength=self.bins)
+
+    def update(self, values):
+        """ add the values at each timestep from a set of runs, given as a (runs, steps) array """
+        values = np.atleast_2d(values)
+        steps = values.shape[1]
+        bins = self.get_bins(values) + np.arange(steps) * self.bins
+        self.counts[:steps] += np.bincount(bins.ravel(), minlength=steps*self.bins).reshape(steps, self.bins)
+
+    def merge(self, other):
+        """ add the counts from another sketch, with the same bins, to this sketch """
+        self.counts += other.counts
+
+    def get_quantiles(self, q):
+        """ the approximate value of quantile 'q' at each timestep, interpolated within the bin that holds it """
+        steps = np.arange(self.counts.shape[0])
+        cumulative = np.cumsum(self.counts, axis=1)
+        target = q * cumulative[:,-1]
+
+        # the first bin at which the cumulative count reaches the target
+        index = np.argmax(cumulative >= target[:,np.newaxis], axis=1)
+        inside = self.counts[steps, index]
+        below = cumulative[steps, index] - inside
+        fraction = np.divide(target - below, inside, out=np.zeros(len(steps)), where=inside > 0)
+        return self.low + (index + fraction) * self.bin_width
+
+
+def save_test_stats(file_name, stats, **arrays):
+    """ save the stats returned by SocketExperiment.get_test_stats, and any other supplied arrays, to an .npz file
+        - the file is written under a temporary name and then renamed, so it's never left half written """
+
+    arrays['number_of_tests'] = stats['number_of_tests']
+    for name, value in stats.items():
+        if isinstance(value, RunningStats):
+            arrays[f'{name}.count'] = value.count
+            arrays[f'{name}.mean'] = value.mean
+            arrays[f'{name}.m2'] = value.m2
+
+    sketch = stats.get('reward_sketch')
+    if sketch is not None:
+        arrays['reward_sketch.range'] = [sketch.low, sketch.high]
+        arrays['reward_sketch.counts'] = sketch.counts
+
+    temporary_name = f'{file_name}.tmp'
+    with open(temporary_name, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temporary_name, file_name)
+
+def load_test_stats(file_name):
+    """ load the stats saved by save_test_stats
+        - returns the stats, in the form given by SocketExperiment.get_test_stats, and a dictionary of the other saved arrays """
+
+    with np.load(file_name) as data:
+        arrays = {name: data[name] for name in data.files}
+
+    stats = {'number_of_tests': int(arrays.pop('number_of_tests')), 'reward_sketch': None}
+    for name in [name[:-len('.count')] for name in arrays if name.endswith('.count')]:
+        running_stats = RunningStats()
+        running_stats.count = int(arrays.pop(f'{name}.count'))
+        running_stats.mean = arrays.pop(f'{name}.mean')
+        running_stats.m2 = arrays.pop(f'{name}.m2')
+        stats[name] = running_stats
+
+    if 'reward_sketch.counts' in arrays:
+        low, high = arrays.pop('reward_sketch.range')
+        counts = arrays.pop('reward_sketch.counts')
+        sketch = QuantileSketch(counts.shape[0], low, high, bins=counts.shape[1])
+        sketch.counts = counts
+        stats['reward_sketch'] = sketch
+
+    return stats, arrays
+
+def get_rng_state(rng):
+    """ the state of a numpy Generator, a RandomState or numpy's global random state, as a JSON string """
+    if isinstance(rng, np.random.Generator):
+        state = rng.bit_generator.state
+    else:
+        state = rng.get_state(legacy=False)
+    return json.dumps(state, default=lambda value: value.tolist())
+
+def set_rng_state(rng, state):
+    """ restore the state, given as a JSON string by get_rng_state, of a random number generator """
+    state = json.loads(state)
+    if isinstance(rng, np.random.Generator):
+        rng.bit_generator.state = state
+    else:
+        rng.set_state(state)
+
+
+def run_test_chunk(socket_tester, number_of_tests, number_of_steps, maximum_total_reward, batch_size, seed_sequence,
+                   reward_range=None, reward_bins=100):
+    """ run a chunk of the tests of an experiment with its own independent random number generator
+        and return the running stats of each statistic over the chunk """
+
+    # give the tester its own generator and, for any code that still uses numpy's global
+    # random state, seed that from the same sequence for the duration of the chunk
+    # - a tester without its own generator is given None afterwards, to go back to the global state
+    rng = vars(socket_tester).get('rng')
+    global_state = np.random.get_state()
+    socket_tester.set_rng(np.random.default_rng(seed_sequence))
+    np.random.seed(seed_sequence.generate_state(4))
+
+    try:
+        experiment = SocketExperiment(socket_tester = socket_tester,
+                                      number_of_tests = number_of_tests,
+                                      number_of_steps = number_of_steps,
+                                      maximum_total_reward = maximum_total_reward,
+                                      batch_size = batch_size,
+                                      reward_range = reward_range,
+                                      reward_bins = reward_bins)
+        experiment.run()
+    finally:
+        socket_tester.set_rng(rng)
+        np.random.set_state(global_state)
+
+    return experiment.get_test_stats()
+
     
 class SocketExperiment():
     """ setup and run repeated socket tests to get the average results """
@@ -232,111 +1034,508 @@ class SocketExperiment():
                  number_of_tests = 1000,
                  number_of_steps = 30,                      
                  maximum_total_reward = float('inf'),
-                 **kwargs ):  
+                 batch_size = 1000,
+                 workers = 1,
+                 seed = None,
+                 reward_range = None,
+                 reward_bins = 100,
+                 tolerances = None,
+                 confidence = 0.95,
+                 checkpoint_file = None,
+                 checkpoint_interval = 1,
+                 **kwargs ):
         
         self.socket_tester = socket_tester
         self.number_of_tests = number_of_tests
         self.number_of_steps = number_of_steps    
         self.maximum_total_reward = maximum_total_reward
-        self.number_of_sockets = self.socket_tester.number_of_sockets
-                
-    def initialize_run(self):
-        
-        # keep track of the average values over the run
-        self.mean_total_reward = 0.
-        self.optimal_selected = 0.                
-        self.mean_time_steps = 0.
-        self.socket_percentages = np.zeros(self.number_of_sockets)   
-        self.estimates = np.zeros(shape=(self.number_of_steps+1,self.number_of_sockets))        
-        self.number_of_trials = np.zeros(shape=(self.number_of_steps+1,self.number_of_sockets))
         
-        # the cumulative total reward per timestep
-        self.cumulative_reward_per_timestep = np.zeros(shape=(self.number_of_steps))
+        # the number of tests run at once by a batch socket tester
+        # - when the tests are split across processes this is also the size of each chunk of tests
+        self.batch_size = batch_size
         
-        # the actual reward obtained at each timestep
-        self.reward_per_timestep = np.zeros(shape=(self.number_of_steps))
+        # the number of processes used to run the tests
+        self.workers = workers
         
+        # the seed from which each chunk of tests gets its own random number generator
+        # - results for a given seed don't depend on the number of workers
+        self.seed = seed
+        self.number_of_sockets = self.socket_tester.number_of_sockets
+
+        # the (low, high) range of the histogram used to find the quantiles of the reward at each
+        # timestep and its number of bins - by default no histogram is kept
+        self.reward_range = reward_range
+        self.reward_bins = reward_bins
+
+        # the largest allowed half-width of the confidence interval of each chosen statistic,
+        # such as {'optimal_selected': 0.005} - if given, the experiment stops as soon as all the
+        # intervals are narrow enough, so 'number_of_tests' becomes the maximum number of tests
+        # - this is only checked after each batch or chunk of 'batch_size' tests, so the number of tests
+        #   run is always a multiple of 'batch_size', unless all 'number_of_tests' are run
+        self.tolerances = tolerances
+        self.confidence = confidence
+        for name in (tolerances or {}):
+            if name not in self.get_tracked_stats():
+                raise ValueError(f"a tolerance is given for '{name}', which isn't one of the statistics "
+                                 f"tracked by the experiment {self.get_tracked_stats()}")
+
+        # the .npz file that the stats and random number generator state are saved to after every
+        # 'checkpoint_interval' batches or chunks of tests, and at the end of the run
+        # - if the file already exists the run continues from the test after the last one saved
+        # - the number of tests can be increased when continuing, but the other settings must be the same
+        # - for a seeded or multi-process run the number of tests can only be increased if the tests
+        #   saved in the checkpoint were a whole number of 'batch_size' chunks
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+                
+    # the statistics that are tracked over the tests of an experiment
+    test_stats = ('mean_total_reward', 'optimal_selected', 'mean_time_steps', 'socket_percentages',
+                  'estimates', 'number_of_trials', 'cumulative_reward_per_timestep', 'reward_per_timestep')
+
+    # the statistics that are only tracked when the tests run for every timestep, without a maximum total reward
+    timestep_stats = ('estimates', 'number_of_trials', 'reward_per_timestep')
+
+    def get_tracked_stats(self):
+        """ the names of the statistics that are updated by the tests of the experiment """
+        if self.maximum_total_reward == float('inf'): return list(self.test_stats)
+        return [name for name in self.test_stats if name not in self.timestep_stats]
+
+    def initialize_run(self):
+
+        # the number of tests that have been run
+        self.number_of_tests_run = 0
+
+        # keep track of the running mean and variance of each statistic over the tests
+        # - the estimates and number of trials are recorded at the start of every timestep and after the last one
+        steps = self.number_of_steps
+        shapes = {'mean_total_reward': (),
+                  'optimal_selected': (),
+                  'mean_time_steps': (),
+                  'socket_percentages': (self.number_of_sockets,),
+                  'estimates': (steps+1, self.number_of_sockets),
+                  'number_of_trials': (steps+1, self.number_of_sockets),
+                  'cumulative_reward_per_timestep': (steps,),
+                  'reward_per_timestep': (steps,)}
+        self.running_stats = {name: RunningStats(shapes[name]) for name in self.test_stats}
+
+        # the distribution of the reward obtained at each timestep
+        # - this isn't kept when the tests only run until a maximum reward value is reached
+        self.reward_sketch = None
+        if self.reward_range is not None and self.maximum_total_reward == float('inf'):
+            self.reward_sketch = QuantileSketch(steps, *self.reward_range, bins=self.reward_bins)
+
     def get_mean_total_reward(self):
         """ the final total reward averaged over the number of timesteps """
-        return self.mean_total_reward
-    
+        return self.running_stats['mean_total_reward'].get_mean()
+
     def get_cumulative_reward_per_timestep(self):
         """ the cumulative total reward per timestep """
-        return self.cumulative_reward_per_timestep
-    
+        return self.running_stats['cumulative_reward_per_timestep'].get_mean()
+
     def get_reward_per_timestep(self):
         """ the mean actual reward obtained at each timestep """
-        return self.reward_per_timestep
+        return self.running_stats['reward_per_timestep'].get_mean()
 
     def get_optimal_selected(self):
         """ the mean times the optimal socket was selected """
-        return self.optimal_selected
+        return self.running_stats['optimal_selected'].get_mean()
 
-    def get_socket_percentages(self): 
+    def get_socket_percentages(self):
         """ the mean of the percentage times each socket was selected """
-        return self.socket_percentages
-    
+        return self.running_stats['socket_percentages'].get_mean()
+
     def get_estimates(self):
         """ per socket reward estimates """
-        return self.estimates
-    
+        return self.running_stats['estimates'].get_mean()
+
     def get_number_of_trials(self):
         """ per socket number of trials """
-        return self.number_of_trials  
-    
+        return self.running_stats['number_of_trials'].get_mean()
+
     def get_mean_time_steps(self):
         """ the average number of trials of each test """
-        return self.mean_time_steps
-    
-    def update_mean( self, current_mean, new_value, n ):
-        """ calculate the new mean from the previous mean and the new value """
-        return (1 - 1.0/n) * current_mean + (1.0/n) * new_value
+        return self.running_stats['mean_time_steps'].get_mean()
 
-    def update_mean_array( self, current_mean, new_value, n ):
-        """ calculate the new mean from the previous mean and the new value for an array """
+    def get_number_of_tests_run(self):
+        """ the number of tests that were actually run, which may be fewer than requested when stopping early """
+        return self.number_of_tests_run
+
+    def get_stats(self, name):
+        """ the running stats of one of the tracked statistics, such as 'optimal_selected' """
+        return self.running_stats[name]
+
+    def get_confidence_interval(self, name, confidence = 0.95):
+        """ the lower and upper limits of the confidence interval of the mean of a tracked statistic """
+        return self.running_stats[name].get_confidence_interval(confidence)
+
+    def get_reward_quantiles(self, q):
+        """ the approximate quantile 'q' of the reward obtained at each timestep """
+        if self.reward_sketch is None:
+            raise ValueError("reward quantiles are only kept when the experiment is given a 'reward_range' "
+                             "and runs without a maximum total reward")
+        return self.reward_sketch.get_quantiles(q)
+
+    def get_test_stats(self):
+        """ the number of tests that have been run and the running stats of each tracked statistic """
+        stats = dict(self.running_stats)
+        stats['number_of_tests'] = self.number_of_tests_run
+        stats['reward_sketch'] = self.reward_sketch
+        return stats
+
+    def merge_test_stats(self, stats):
+        """ combine the running stats from a separate set of tests with the current stats """
+        for name in self.test_stats:
+            self.running_stats[name].merge(stats[name])
+        if self.reward_sketch is not None:
+            self.reward_sketch.merge(stats['reward_sketch'])
+        self.number_of_tests_run += stats['number_of_tests']
+
+    def has_converged(self):
+        """ test if the confidence interval of every statistic that has a tolerance is within that tolerance
+            - for an array of statistics every element must be within the tolerance """
+        if not self.tolerances: return False
+        return all(np.all(self.running_stats[name].get_half_width(self.confidence) <= tolerance)
+                   for name, tolerance in self.tolerances.items())
+
+    def get_checkpoint_settings(self):
+        """ a description of the settings that must match for a run to continue from a checkpoint,
+            including the tester's parameters and socket values """
+        return repr((self.socket_tester.get_settings(), self.number_of_steps, self.maximum_total_reward,
+                     self.batch_size, self.seed, self.reward_range, self.reward_bins))
+
+    def save_checkpoint(self):
+        """ save the stats of the tests run so far and the state of the tester's random number generator """
+        save_test_stats(self.checkpoint_file, self.get_test_stats(),
+                        settings = self.get_checkpoint_settings(),
+                        rng_state = get_rng_state(self.socket_tester.rng))
+
+    def load_checkpoint(self):
+        """ restore the stats and random number generator state from the checkpoint file, if it exists
+            - returns true if the run is continuing from a checkpoint """
+        if self.checkpoint_file is None or not os.path.exists(self.checkpoint_file):
+            return False
+
+        stats, arrays = load_test_stats(self.checkpoint_file)
+        if str(arrays['settings']) != self.get_checkpoint_settings():
+            raise ValueError(f"the checkpoint '{self.checkpoint_file}' was saved by an experiment with different settings")
+
+        for name in self.test_stats:
+            self.running_stats[name] = stats[name]
+        if self.reward_sketch is not None:
+            self.reward_sketch = stats['reward_sketch']
+        self.number_of_tests_run = stats['number_of_tests']
+        set_rng_state(self.socket_tester.rng, str(arrays['rng_state']))
+        return True
+
+    def update_checkpoint(self):
+        """ save a checkpoint if the number of batches of tests run is a multiple of the checkpoint interval """
+        if self.checkpoint_file is None: return
+        batches = (self.number_of_tests_run + self.batch_size - 1) // self.batch_size
+        if batches % self.checkpoint_interval == 0:
+            self.save_checkpoint()
 
-        new_value = np.array(new_value)
-        
-        # pad the new array with its last value to make sure its the same length as the original           
-        pad_length = (current_mean.shape[0] - new_value.shape[0])               
-        
-        if pad_length > 0:
-            new_array = np.pad(new_value,(0,pad_length), mode='constant', constant_values=new_value[-1])
-        else:
-            new_array = new_value
-    
-        return (1 - 1.0/n) * current_mean + (1.0/n) * new_array
-        
     def record_test_stats(self,n):
-        """ update the mean value for each statistic being tracked over a run """
+        """ add the values from a single run to each statistic being tracked """
 
-        # calculate the new means from the old means and the new value
         tester = self.socket_tester
-        self.mean_total_reward = self.update_mean( self.mean_total_reward, tester.get_mean_reward(), n)
-        self.optimal_selected = self.update_mean( self.optimal_selected, tester.get_optimal_socket_percentage(), n)
-        self.socket_percentages = self.update_mean( self.socket_percentages, tester.get_socket_percentages(), n)        
-        self.mean_time_steps = self.update_mean( self.mean_time_steps, tester.get_time_steps(), n)
-        
-        self.cumulative_reward_per_timestep = self.update_mean_array( self.cumulative_reward_per_timestep, 
-                                                                      tester.get_total_reward_per_timestep(), n)        
+        stats = self.running_stats
+        stats['mean_total_reward'].update(tester.get_mean_reward())
+        stats['optimal_selected'].update(tester.get_optimal_socket_percentage())
+        stats['socket_percentages'].update(tester.get_socket_percentages())
+        stats['mean_time_steps'].update(tester.get_time_steps())
+        self.number_of_tests_run = n
+
+        # the per-timestep values are read straight from the tester's buffers, without copying them for every test
+        total_reward_per_timestep, reward_per_timestep, estimates, number_of_trials = tester.get_run_buffers()
+
+        # a run that stopped early is treated as if it kept its final total reward for the remaining timesteps
+        stats['cumulative_reward_per_timestep'].update(total_reward_per_timestep)
+
+        # check if the tests are only running until a maximum reward value is reached
+        if self.maximum_total_reward == float('inf'):
+
+            stats['estimates'].update(estimates)
+            stats['reward_per_timestep'].update(reward_per_timestep)
+            stats['number_of_trials'].update(number_of_trials)
+            if self.reward_sketch is not None:
+                self.reward_sketch.update(reward_per_timestep)
+
+    def record_batch_stats(self,n,batch_n):
+        """ add the values from a batch of 'batch_n' runs to each statistic being tracked """
+
+        # the per-test values are added as a batch, while the per-timestep values are already
+        # reduced, by the tester, to their mean and sum of squared deviations over the batch
+        tester = self.socket_tester
+        stats = self.running_stats
+        stats['mean_total_reward'].update_batch(tester.get_mean_reward())
+        stats['optimal_selected'].update_batch(tester.get_optimal_socket_percentage())
+        stats['socket_percentages'].update_batch(tester.get_socket_percentages())
+        stats['mean_time_steps'].update_batch(tester.get_time_steps())
+
+        moments = tester.get_timestep_moments()
+        stats['cumulative_reward_per_timestep'].add(batch_n, *moments['cumulative_reward_per_timestep'])
 
         # check if the tests are only running until a maximum reward value is reached
         if self.maximum_total_reward == float('inf'):
 
-            self.estimates = self.update_mean_array( self.estimates, tester.get_estimates(), n)        
-            self.cumulative_reward_per_timestep = self.update_mean_array( self.cumulative_reward_per_timestep, 
-                                                                          tester.get_total_reward_per_timestep(), n)
-            self.reward_per_timestep = self.update_mean_array( self.reward_per_timestep, tester.get_reward_per_timestep(), n)
-            self.number_of_trials = self.update_mean_array( self.number_of_trials, tester.get_number_of_trials(), n)
+            for name in ('estimates', 'reward_per_timestep', 'number_of_trials'):
+                stats[name].add(batch_n, *moments[name])
+
+        self.number_of_tests_run = n + batch_n
+
+    def run_batches(self):
+        """ run the tests as a sequence of batches, with all tests of a batch run at once """
+
+        # the tester adds the rewards of each timestep straight to the reward histogram
+        self.socket_tester.reward_sketch = self.reward_sketch
+        try:
+            n = self.number_of_tests_run
+            while n < self.number_of_tests:
+
+                # do one batch of runs of the test
+                batch_n = min(self.batch_size, self.number_of_tests - n)
+                self.socket_tester.run( batch_n, self.number_of_steps, self.maximum_total_reward )
+                self.record_batch_stats(n, batch_n)
+                self.update_checkpoint()
+                n += batch_n
+
+                if self.has_converged():
+                    break
+        finally:
+            self.socket_tester.reward_sketch = None
+
+    def get_chunks(self, seed_sequence=None):
+        """ split the tests into chunks, each with its own random number generator, and return
+            the arguments of run_test_chunk for each chunk
+            - by default the generators are spawned from the experiment's seed """
+
+        # the number of tests in each chunk
+        # - this only depends on the batch size, so that the random numbers used by each
+        #   test, and therefore the results, are the same for any number of workers
+        chunk_sizes = [min(self.batch_size, self.number_of_tests - n)
+                       for n in range(0, self.number_of_tests, self.batch_size)]
+        if seed_sequence is None:
+            seed_sequence = np.random.SeedSequence(self.seed)
+        seed_sequences = seed_sequence.spawn(len(chunk_sizes))
+
+        return [(self.socket_tester, chunk_size, self.number_of_steps, self.maximum_total_reward,
+                 self.batch_size, chunk_seed_sequence, self.reward_range, self.reward_bins)
+                for chunk_size, chunk_seed_sequence in zip(chunk_sizes, seed_sequences)]
+
+    def run_chunks(self):
+        """ run the chunks of tests in parallel over a pool of worker processes """
+
+        # the random numbers of a chunk depend on its size, so a smaller final chunk that was saved
+        # in a checkpoint can't be topped up to give the same results as a run of the full chunk
+        if self.number_of_tests_run % self.batch_size and self.number_of_tests_run < self.number_of_tests:
+            raise ValueError(f"the checkpoint '{self.checkpoint_file}' ends with a partial chunk of tests, "
+                             f"so the number of tests can't be increased from {self.number_of_tests_run}")
+
+        # skip any chunks that were run before the checkpoint
+        chunks = self.get_chunks()
+        chunks = chunks[(self.number_of_tests_run + self.batch_size - 1) // self.batch_size:]
+
+        # combine the stats of each chunk in chunk order
+        # - when stopping early the same chunks are used, whatever the number of workers
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(run_test_chunk, *chunk) for chunk in chunks]
+                for future in futures:
+                    self.merge_test_stats(future.result())
+                    self.update_checkpoint()
+                    if self.has_converged():
+                        # any chunks that haven't started yet are no longer needed
+                        for future in futures: future.cancel()
+                        break
+        else:
+            for stats in itertools.starmap(run_test_chunk, chunks):
+                self.merge_test_stats(stats)
+                self.update_checkpoint()
+                if self.has_converged():
+                    break
+
+    def run_tests(self):
+        """ run the tests one at a time """
+
+        for n in range(self.number_of_tests_run+1,self.number_of_tests+1):
+
+            # do one run of the test
+            self.socket_tester.run( self.number_of_steps, self.maximum_total_reward )
+            self.record_test_stats(n)
+
+            # checkpoints and the check for stopping early are done after each batch of tests
+            if n % self.batch_size == 0:
+                self.update_checkpoint()
+                if self.has_converged():
+                    break
     
     def run(self):
         """ repeat the test over a set of sockets for the specified number of trials """
                     
         # do the specified number of runs for a single test
         self.initialize_run()
-        for n in range(1,self.number_of_tests+1):
 
-            # do one run of the test                               
-            self.socket_tester.run( self.number_of_steps, self.maximum_total_reward )
-            self.record_test_stats(n)                         
-           
\ No newline at end of file
+        # continue from the checkpoint of an earlier run, unless that had already finished early
+        if self.load_checkpoint() and self.has_converged():
+            return
+
+        # seeded or multi-process runs give each chunk of tests its own random number generator
+        if self.workers > 1 or self.seed is not None:
+            self.run_chunks()
+
+        # a batch socket tester runs many tests at once
+        elif isinstance(self.socket_tester, BatchSocketTester):
+            self.run_batches()
+
+        else:
+            self.run_tests()
+
+        # save the final stats
+        if self.checkpoint_file is not None:
+            self.save_checkpoint()
+
+
+class SocketSweep():
+    """ run a socket experiment for every combination of a grid of tester parameters
+
+        - the tests of each set of parameters are split into chunks and all of these (parameters, chunk)
+          work units are shared between a pool of worker processes
+        - if a checkpoint directory is given each finished work unit is saved to it, so that a sweep
+          that's been stopped only runs the remaining units when it's restarted
+    """
+
+    def __init__(self,
+                 tester_factory,
+                 parameters,
+                 number_of_tests = 1000,
+                 number_of_steps = 30,
+                 maximum_total_reward = float('inf'),
+                 batch_size = 1000,
+                 workers = 1,
+                 seed = None,
+                 checkpoint_dir = None,
+                 confidence = 0.95,
+                 reward_range = None,
+                 reward_bins = 100,
+                 **kwargs ):
+
+        # the sweep runs the chunks of the experiments itself, so any other experiment settings,
+        # such as 'tolerances' or 'checkpoint_file', would have no effect
+        if kwargs:
+            raise ValueError(f"the settings {sorted(kwargs)} can't be used by a sweep, "
+                             f"only 'reward_range' and 'reward_bins' are passed to its experiments")
+
+        # the function called with each set of parameters to create its socket tester,
+        # for example 'UCBBatchSocketTester' or 'lambda epsilon: EpsilonGreedyBatchSocketTester(epsilon=epsilon)'
+        # - the testers are created in this process, so the function doesn't need to be picklable
+        self.tester_factory = tester_factory
+
+        # the list of values of each parameter, such as {'confidence_level': [0.2,0.4,0.6]}
+        # - a set of parameters is made for every combination of the values
+        names = list(parameters)
+        self.parameter_sets = [dict(zip(names, values)) for values in itertools.product(*parameters.values())]
+
+        self.number_of_tests = number_of_tests
+        self.number_of_steps = number_of_steps
+        self.maximum_total_reward = maximum_total_reward
+        self.batch_size = batch_size
+        self.workers = workers
+        self.seed = seed
+        self.checkpoint_dir = checkpoint_dir
+        self.confidence = confidence
+
+        # the range and number of bins of the reward histogram of each experiment
+        self.reward_range = reward_range
+        self.reward_bins = reward_bins
+
+    def get_checkpoint_file(self, parameter_index, chunk_index):
+        """ the file that a finished work unit is saved to """
+        return os.path.join(self.checkpoint_dir, f'unit_{parameter_index}_{chunk_index}.npz')
+
+    def get_unit_key(self, parameter_index, chunk):
+        """ a description of a work unit, saved with its checkpoint to make sure that the checkpoint belongs to the same sweep,
+            including the parameters and socket values of the unit's tester """
+        tester, chunk_size, number_of_steps, maximum_total_reward, batch_size, _, reward_range, reward_bins = chunk
+        return repr((self.parameter_sets[parameter_index], tester.get_settings(), chunk_size, number_of_steps,
+                     maximum_total_reward, batch_size, self.seed, reward_range, reward_bins))
+
+    def load_unit(self, parameter_index, chunk_index, chunk):
+        """ load the stats of a work unit from its checkpoint, or return None if it hasn't been run """
+        if self.checkpoint_dir is None: return None
+        file_name = self.get_checkpoint_file(parameter_index, chunk_index)
+        if not os.path.exists(file_name): return None
+
+        stats, arrays = load_test_stats(file_name)
+        if str(arrays['unit_key']) != self.get_unit_key(parameter_index, chunk):
+            raise ValueError(f"the checkpoint '{file_name}' is from a different sweep")
+        return stats
+
+    def save_unit(self, parameter_index, chunk_index, chunk, stats):
+        """ save the stats of a finished work unit to its checkpoint """
+        if self.checkpoint_dir is None: return
+        save_test_stats(self.get_checkpoint_file(parameter_index, chunk_index), stats,
+                        unit_key = self.get_unit_key(parameter_index, chunk))
+
+    def run(self):
+        """ run the experiment for every set of parameters and return the table of results """
+
+        if self.checkpoint_dir is not None:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        # an experiment for each set of parameters, into which the stats of its chunks are merged
+        self.experiments = [SocketExperiment(socket_tester = self.tester_factory(**parameters),
+                                             number_of_tests = self.number_of_tests,
+                                             number_of_steps = self.number_of_steps,
+                                             maximum_total_reward = self.maximum_total_reward,
+                                             batch_size = self.batch_size,
+                                             reward_range = self.reward_range,
+                                             reward_bins = self.reward_bins)
+                            for parameters in self.parameter_sets]
+
+        # the random numbers of each set of parameters, and each of its chunks, come from their own seed sequence
+        seed_sequences = np.random.SeedSequence(self.seed).spawn(len(self.experiments))
+
+        # the work units that haven't already been run
+        results = {}
+        pending = []
+        for i, experiment in enumerate(self.experiments):
+            experiment.initialize_run()
+            for j, chunk in enumerate(experiment.get_chunks(seed_sequences[i])):
+                stats = self.load_unit(i, j, chunk)
+                if stats is None: pending.append((i, j, chunk))
+                else: results[(i,j)] = stats
+
+        # save each work unit as soon as it finishes, in whatever order that happens
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(run_test_chunk, *chunk): (i, j, chunk) for i, j, chunk in pending}
+                for future in as_completed(futures):
+                    i, j, chunk = futures[future]
+                    results[(i,j)] = future.result()
+                    self.save_unit(i, j, chunk, results[(i,j)])
+        else:
+            for i, j, chunk in pending:
+                results[(i,j)] = run_test_chunk(*chunk)
+                self.save_unit(i, j, chunk, results[(i,j)])
+
+        # combine the stats of the chunks of each set of parameters in chunk order
+        for i, j in sorted(results):
+            self.experiments[i].merge_test_stats(results[(i,j)])
+
+        return self.get_results()
+
+    def get_results(self):
+        """ a table with a row for each set of parameters, giving the mean and confidence interval
+            half-width of each of the per-test statistics """
+        import pandas as pd
+
+        rows = []
+        for parameters, experiment in zip(self.parameter_sets, self.experiments):
+            row = dict(parameters)
+            row['number_of_tests'] = experiment.get_number_of_tests_run()
+            for name in ('mean_total_reward', 'optimal_selected', 'mean_time_steps'):
+                stats = experiment.get_stats(name)
+                row[name] = stats.get_mean()
+                row[f'{name}_half_width'] = stats.get_half_width(self.confidence)
+            rows.append(row)
+        return pd.DataFrame(rows)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import PowerSocketSystem directly, in the same way as the notebooks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from PowerSocketSystem import SocketTester, BatchSocketTester, SocketExperiment
+
+
+@pytest.fixture(scope='module')
+def experiments():
+  """ the same seeded experiment run with the greedy socket tester and with the batch socket tester """
+  return run_experiment(SocketTester()), run_experiment(BatchSocketTester())
+
+
+def run_experiment(socket_tester, number_of_tests = 2000, number_of_steps = 30):
+  experiment = SocketExperiment(socket_tester = socket_tester,
+                                number_of_tests = number_of_tests,
+                                number_of_steps = number_of_steps,
+                                batch_size = 500,
+                                seed = 1)
+  experiment.run()
+  return experiment
+
+
+@pytest.mark.parametrize('name', ['mean_total_reward', 'optimal_selected', 'socket_percentages',
+                                  'estimates', 'cumulative_reward_per_timestep'])
+def test_batch_matches_single_tests(experiments, name):
+  """ check that the batch tester gives the same statistics, within their confidence intervals,
+      as running the greedy socket tester one test at a time """
+  single, batch = (experiment.get_stats(name) for experiment in experiments)
+
+  assert single.count == batch.count == 2000
+
+  # the difference of the means is within 4 standard errors, or equal where neither varies
+  difference = np.abs(single.get_mean() - batch.get_mean())
+  standard_error = np.sqrt(single.get_standard_error()**2 + batch.get_standard_error()**2)
+  assert np.all(difference <= 4*standard_error + 1e-9)
@@ -0,0 +1,26 @@
+import os
+import sys
+import subprocess
+
+import PowerSocketSystem
+
+
+def test_import_time(maximum_time = 0.5):
+  """ import the module in a new interpreter and check that none of the lazily imported libraries
+      are loaded and that, on top of the numpy import, it takes less than the maximum time (in seconds) """
+
+  code = ("import sys, time, numpy\n"
+          "start = time.perf_counter()\n"
+          "import PowerSocketSystem\n"
+          "print(time.perf_counter() - start)\n"
+          "print(' '.join(sys.modules))")
+  result = subprocess.run([sys.executable, '-c', code],
+                          cwd=os.path.dirname(os.path.abspath(PowerSocketSystem.__file__)),
+                          capture_output=True, text=True, check=True)
+  lines = result.stdout.splitlines()
+  import_time = float(lines[0])
+  modules = set(lines[1].split())
+
+  loaded = [module_name for module_name,_ in PowerSocketSystem.lazy_imports.values() if module_name in modules]
+  assert not loaded, f"importing PowerSocketSystem also imported {loaded}"
+  assert import_time <= maximum_time, f"importing PowerSocketSystem took {import_time:0.3f}s, more than {maximum_time}s"
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from PowerSocketSystem import MAX_LOOP_ARGMAX, random_argmax, RandomArgmax
+
+
+def get_tied_values(number_of_values, tied):
+  """ values in which the largest value is at each of the 'tied' indices """
+  values = [float(i % 3) for i in range(number_of_values)]
+  for index in tied: values[index] = 10.
+  return values
+
+
+@pytest.mark.parametrize('number_of_values', [5, MAX_LOOP_ARGMAX, MAX_LOOP_ARGMAX+8])
+def test_random_argmax_ties(number_of_values, number_of_calls = 30000):
+  """ check that random_argmax, both with the python loop and with numpy arrays, only chooses
+      the largest values and chooses between them uniformly """
+  tied = [0, 2, number_of_values-1]
+  values = get_tied_values(number_of_values, tied)
+  rng = np.random.default_rng(1)
+
+  counts = np.bincount([random_argmax(values, rng) for _ in range(number_of_calls)], minlength=number_of_values)
+  assert counts.sum() == counts[tied].sum()
+  np.testing.assert_allclose(counts[tied] / number_of_calls, 1/len(tied), atol=0.015)
+
+
+def test_random_argmax_without_ties():
+  rng = np.random.default_rng(1)
+  for number_of_values in (1, 5, MAX_LOOP_ARGMAX+8):
+    values = list(range(number_of_values))
+    assert random_argmax(values, rng) == number_of_values-1
+    assert random_argmax(values[::-1], rng) == 0
+
+
+def test_batch_random_argmax_ties(number_of_tests = 30000):
+  """ check that RandomArgmax chooses uniformly between the largest values of each row """
+  tied = [1, 3, 4]
+  values = np.tile(get_tied_values(5, tied), (number_of_tests, 1))
+  values[::2, 3] = 20.
+  argmax = RandomArgmax(number_of_tests, 5)
+
+  index = argmax(values, np.random.default_rng(1))
+  assert np.all(index[::2] == 3)
+  counts = np.bincount(index[1::2], minlength=5)
+  assert counts.sum() == counts[tied].sum()
+  np.testing.assert_allclose(counts[tied] / len(index[1::2]), 1/len(tied), atol=0.015)
+
+  # fewer tests only use the start of the work arrays
+  assert np.all(argmax(values[:10:2], np.random.default_rng(2)) == 3)
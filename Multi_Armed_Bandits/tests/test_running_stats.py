@@ -0,0 +1,55 @@
+import numpy as np
+
+from PowerSocketSystem import RunningStats, BatchSocketTester
+
+
+def test_merge_matches_single_pass():
+  """ check that merging the stats of separate chunks of values gives the same stats as a single pass """
+  values = np.random.default_rng(1).normal(5, 2, size=(1000, 3))
+
+  single = RunningStats((3,))
+  for value in values: single.update(value)
+
+  merged = RunningStats((3,))
+  for chunk in np.array_split(values, [1, 250, 600, 601]):
+    stats = RunningStats((3,))
+    for value in chunk: stats.update(value)
+    merged.merge(stats)
+
+  assert merged.count == single.count == 1000
+  np.testing.assert_allclose(merged.get_mean(), single.get_mean())
+  np.testing.assert_allclose(merged.get_variance(), single.get_variance())
+  np.testing.assert_allclose(single.get_mean(), values.mean(axis=0))
+  np.testing.assert_allclose(single.get_variance(), values.var(axis=0, ddof=1))
+
+
+def test_variance_of_values_with_a_large_offset():
+  """ check that the variance is still accurate when it's tiny compared to the mean """
+  values = 1e9 + np.random.default_rng(1).normal(0, 1e-3, size=1000)
+
+  stats = RunningStats()
+  for chunk in np.array_split(values, 4):
+    chunk_stats = RunningStats()
+    chunk_stats.update_batch(chunk)
+    stats.merge(chunk_stats)
+
+  np.testing.assert_allclose(stats.get_variance(), np.var(values - 1e9, ddof=1), rtol=1e-3)
+
+
+def test_batch_timestep_moments():
+  """ check the per-timestep moments of the batch tester against the values of each of its runs """
+  socket_tester = BatchSocketTester(seed=1)
+  socket_tester.run(200, 10, maximum_total_reward = 60)
+  moments = socket_tester.get_timestep_moments()
+
+  # the final total reward of every run, including those that finished early
+  mean, m2 = moments['cumulative_reward_per_timestep']
+  total_reward = socket_tester.total_reward
+  np.testing.assert_allclose(mean[-1], total_reward.mean())
+  np.testing.assert_allclose(m2[-1], ((total_reward - total_reward.mean())**2).sum())
+
+  # the number of trials of each socket at the end of the runs
+  mean, m2 = moments['number_of_trials']
+  trials = socket_tester.n
+  np.testing.assert_allclose(mean[-1], trials.mean(axis=0))
+  np.testing.assert_allclose(m2[-1], ((trials - trials.mean(axis=0))**2).sum(axis=0))
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from PowerSocketSystem import SocketTester, BatchSocketTester, SocketExperiment
+
+
+@pytest.mark.parametrize('socket_tester', [SocketTester, BatchSocketTester])
+def test_seeded_workers(socket_tester, number_of_tests = 40, number_of_steps = 20, batch_size = 10):
+  """ check that a tester that has run a seeded experiment in this process can then be sent to
+      worker processes, and that it gives the same results there """
+
+  socket_tester = socket_tester()
+  results = []
+  for workers in (1, 2):
+    experiment = SocketExperiment(socket_tester = socket_tester,
+                                  number_of_tests = number_of_tests,
+                                  number_of_steps = number_of_steps,
+                                  batch_size = batch_size,
+                                  workers = workers,
+                                  seed = 1)
+    experiment.run()
+    results.append(experiment.get_mean_total_reward())
+
+  assert results[0] == results[1]
+
+
+def run_experiment(number_of_tests, checkpoint_file = None):
+  """ run a seeded experiment, split into chunks of 10 tests """
+  experiment = SocketExperiment(socket_tester = SocketTester(),
+                                number_of_tests = number_of_tests,
+                                number_of_steps = 20,
+                                batch_size = 10,
+                                seed = 1,
+                                checkpoint_file = checkpoint_file)
+  experiment.run()
+  return experiment
+
+
+def test_resume_with_more_tests(tmp_path):
+  """ check that continuing a checkpoint with more tests gives the same results as an uninterrupted run """
+  checkpoint_file = str(tmp_path / 'checkpoint.npz')
+  run_experiment(50, checkpoint_file)
+  resumed = run_experiment(100, checkpoint_file)
+  uninterrupted = run_experiment(100)
+
+  assert resumed.get_number_of_tests_run() == 100
+  np.testing.assert_allclose(resumed.get_mean_total_reward(), uninterrupted.get_mean_total_reward())
+  np.testing.assert_allclose(resumed.get_estimates(), uninterrupted.get_estimates())
+
+
+def test_resume_with_more_tests_after_partial_chunk(tmp_path):
+  """ check that a checkpoint ending with a partial chunk can't be continued with more tests """
+  checkpoint_file = str(tmp_path / 'checkpoint.npz')
+  run_experiment(55, checkpoint_file)
+
+  with pytest.raises(ValueError):
+    run_experiment(100, checkpoint_file)
+
+  # continuing with the same number of tests doesn't run anything more
+  assert run_experiment(55, checkpoint_file).get_number_of_tests_run() == 55
+
+
+@pytest.mark.parametrize('socket_tester, seed', [(SocketTester, None), (BatchSocketTester, None), (SocketTester, 1)])
+def test_early_stopping(socket_tester, seed):
+  """ check that an experiment stops once its confidence intervals are narrow enough, after a whole
+      number of batches, and reports the number of tests that were actually run """
+  tolerances = {'mean_total_reward': 0.1}
+  socket_tester = socket_tester()
+  socket_tester.set_rng(np.random.default_rng(2))
+  experiment = SocketExperiment(socket_tester = socket_tester,
+                                number_of_tests = 5000,
+                                number_of_steps = 20,
+                                batch_size = 50,
+                                seed = seed,
+                                tolerances = tolerances)
+  experiment.run()
+
+  number_of_tests_run = experiment.get_number_of_tests_run()
+  assert number_of_tests_run < 5000
+  assert number_of_tests_run % 50 == 0
+  assert experiment.get_stats('mean_total_reward').count == number_of_tests_run
+  assert experiment.get_stats('mean_total_reward').get_half_width(0.95) <= 0.1
+
+
+@pytest.mark.parametrize('tolerances, maximum_total_reward', [({'estimates': 0.1}, 100), ({'unknown': 0.1}, float('inf'))])
+def test_tolerance_of_untracked_stat(tolerances, maximum_total_reward):
+  """ check that a tolerance can only be given for a statistic that's tracked by the experiment """
+  with pytest.raises(ValueError):
+    SocketExperiment(socket_tester = SocketTester(), maximum_total_reward = maximum_total_reward, tolerances = tolerances)
@@ -0,0 +1,57 @@
+import pytest
+
+from PowerSocketSystem import EpsilonGreedyBatchSocketTester, UCBBatchSocketTester, SocketExperiment, SocketSweep
+
+
+def run_sweep(tester_factory, parameters, checkpoint_dir):
+  """ run a small seeded sweep, split into chunks of 10 tests """
+
+  # the sweep returns its results as a pandas table
+  pytest.importorskip('pandas')
+  sweep = SocketSweep(tester_factory, parameters,
+                      number_of_tests = 20,
+                      number_of_steps = 10,
+                      batch_size = 10,
+                      seed = 1,
+                      checkpoint_dir = checkpoint_dir)
+  return sweep.run()
+
+
+def test_resume_sweep(tmp_path):
+  """ check that a sweep continued from its checkpoints gives the same results as the original sweep """
+  first = run_sweep(UCBBatchSocketTester, {'confidence_level': [0.5, 2.0]}, str(tmp_path))
+  resumed = run_sweep(UCBBatchSocketTester, {'confidence_level': [0.5, 2.0]}, str(tmp_path))
+  assert first.equals(resumed)
+
+
+@pytest.mark.parametrize('tester_factory', [
+  lambda value: EpsilonGreedyBatchSocketTester(epsilon=value),
+  lambda value: UCBBatchSocketTester(confidence_level=value+1),
+])
+def test_resume_sweep_with_different_tester(tmp_path, tester_factory):
+  """ check that the checkpoints of a sweep can't be used by a sweep with different testers """
+  run_sweep(lambda value: UCBBatchSocketTester(confidence_level=value), {'value': [0.5, 2.0]}, str(tmp_path))
+
+  with pytest.raises(ValueError):
+    run_sweep(tester_factory, {'value': [0.5, 2.0]}, str(tmp_path))
+
+
+def test_unit_key_includes_tester_settings():
+  """ check that the key saved with a sweep's checkpoints changes with the settings of its testers """
+  def get_unit_key(tester_factory):
+    sweep = SocketSweep(tester_factory, {'value': [0.5]}, number_of_tests = 20, batch_size = 10, seed = 1)
+    experiment = SocketExperiment(socket_tester = tester_factory(0.5), number_of_tests = 20, batch_size = 10)
+    return sweep.get_unit_key(0, experiment.get_chunks()[0])
+
+  key = get_unit_key(lambda value: UCBBatchSocketTester(confidence_level=value))
+  assert key == get_unit_key(lambda value: UCBBatchSocketTester(confidence_level=value))
+  assert key != get_unit_key(lambda value: UCBBatchSocketTester(confidence_level=value+1))
+  assert key != get_unit_key(lambda value: UCBBatchSocketTester(confidence_level=value, multiplier=3))
+  assert key != get_unit_key(lambda value: EpsilonGreedyBatchSocketTester(epsilon=value))
+
+
+@pytest.mark.parametrize('setting', [{'tolerances': {'optimal_selected': 0.01}}, {'checkpoint_file': 'sweep.npz'}])
+def test_experiment_settings_not_used_by_sweep(setting):
+  """ check that experiment settings that the sweep doesn't apply are rejected """
+  with pytest.raises(ValueError, match='sweep'):
+    SocketSweep(UCBBatchSocketTester, {'confidence_level': [0.5]}, **setting)
@@ -0,0 +1,17 @@
+import numpy as np
+
+from PowerSocketSystem import SocketTester
+
+
+def test_results_are_kept_after_next_run():
+  """ check that the results of a run aren't changed by running the tester again """
+  socket_tester = SocketTester()
+  socket_tester.set_rng(np.random.default_rng(1))
+  socket_tester.run(20)
+  estimates = socket_tester.get_estimates()
+  rewards = socket_tester.get_reward_per_timestep()
+  saved = estimates.copy(), rewards.copy()
+
+  socket_tester.run(20)
+  np.testing.assert_array_equal(estimates, saved[0])
+  np.testing.assert_array_equal(rewards, saved[1])
@@ -7,16 +7,10 @@ from random import uniform
 from math import pi
 from enum import IntEnum
 
-from ipycanvas import MultiCanvas
-from ipycanvas import Canvas, hold_canvas
-from ipycanvas import RoughCanvas
-from ipywidgets import Image
-from ipywidgets import Layout
-from ipywidgets import Play, IntProgress, HBox, VBox, link
-
 from maze import Maze
 from direction import Direction
 from arrows import Arrows
+from level_mdp import LevelMDP
 
 class Puddle(IntEnum):
     Dry, Small, Large = range(3)   
@@ -28,6 +22,8 @@ class Puddle(IntEnum):
 
 ''' setup all the main components required to animate a grid level '''
 def setup_play_level( level, on_update, interval=1000, min=1, max=8 ):
+  from ipywidgets import Layout, Play, IntProgress, link
+
   play = Play(interval=interval, min=min, max=max, step=1)
   progress = IntProgress(min=min, max=max, step=1)
 
@@ -54,31 +50,44 @@ class GridLevel():
   debug_maze = False      # write the maze to a svg file
 
   splashes = None         # set of tiles where splashes exist
+
+  mdp = None              # the level compiled into arrays, created when first required
   
   save_images = False     # enable writing canvas as an image
+
+  headless = False        # if true the level has no canvases and nothing is drawn
+  canvases = None         # the canvas layers, unless the level is headless
+
+  drawn_text = None       # the text last drawn in each cell, so that unchanged cells aren't redrawn
+  drawn_directions = None # the directions last drawn in each cell
   
   def __init__(self, width, height, 
                start = None,
                end = None,
                add_maze = False,
                maze_seed = None,
+               maze_algorithm = 'depth_first',
                add_compass = False, 
                side_panel = False,
                fill_center = False,
                show_start_text = False,
                show_end_text = True,
-               working_directory = "."):
+               working_directory = ".",
+               headless = False):
     
     self.width = width
     self.height = height
     self.maze_seed = maze_seed
+    self.maze_algorithm = maze_algorithm
     self.fill_center = fill_center
     self.add_compass = add_compass
     self.side_panel = side_panel
     self.show_start_text = show_start_text
     self.show_end_text = show_end_text
     self.working_directory = working_directory
-    
+    self.headless = headless
+    self.clear_drawn_cells()
+
     # calculate other cell values
     self.calculate_dimensions()
     self.calculate_positions()
@@ -94,18 +103,25 @@ class GridLevel():
     if not end: self.end = [self.width-1,self.height-1]
     else: self.end = end      
     
-    self.setup_canvases(add_maze)
+    # a headless level is only a model of the grid, for solving without drawing anything
+    # - ipycanvas and ipywidgets are only imported when the level is drawn
+    if headless:
+      if add_maze: self.create_maze()
+    else:
+      self.setup_canvases(add_maze)
 
   def add_splashes(self, splashes):
     ''' store any splashes that exist on the grid level '''
     self.splashes = splashes    
-    self.draw_splashes()
+    self.mdp = None
+    if not self.headless: self.draw_splashes()
 
   def add_walls(self, walls):
     ''' add the specified walls to the grid '''
 
     # begin with a maze with no walls
     self.maze = Maze(self.width, self.height, self.start[0], self.start[1], no_walls = True)
+    self.mdp = None
 
     for (x, y), direction in walls:
         current_cell = self.maze.cell_at(x,y)
@@ -115,10 +131,22 @@ class GridLevel():
         elif direction == 'S': next_cell = self.maze.cell_at(x,y+1)
         current_cell.add_wall(next_cell, direction)     
 
-    canvas = self.canvases[1]    
-    self.maze.write_to_canvas( canvas,
-                               self.height*self.cell_pixels,
-                               self.padding)     
+    if not self.headless:
+      canvas = self.canvases[1]    
+      self.maze.write_to_canvas( canvas,
+                                 self.height*self.cell_pixels,
+                                 self.padding)     
+
+  def set_maze(self, maze):
+    ''' use an existing maze for the walls of the grid '''
+    self.maze = maze
+    self.mdp = None
+
+    if not self.headless:
+      canvas = self.canvases[1]
+      self.maze.write_to_canvas( canvas,
+                                 self.height*self.cell_pixels,
+                                 self.padding)
 
     
   '''
@@ -155,12 +183,20 @@ class GridLevel():
     return self.end
   
   def save_to_file(self, file_name):    
-    if self.save_images:
+    if self.save_images and not self.headless:
       self.canvases.to_file(file_name)   
   
   def get_canvas_dimensions(self):
     return [self.total_width,self.total_height]
 
+  def get_mdp(self):
+    ''' get the level compiled into arrays of next states, transition probabilities and rewards
+        - the arrays are rebuilt after walls or splashes are added to the level
+    '''
+    if self.mdp is None:
+      self.mdp = LevelMDP(self)
+    return self.mdp
+
 
   def get_available_actions(self,x,y,policy=None):
     ''' return the list of available actions for the specified position in the grid '''
@@ -171,10 +207,8 @@ class GridLevel():
 
     # test if the level contains a maze
     if self.maze is not None:        
-      cell = self.maze.cell_at( x, y )  
-      
       # if a wall is present then that direction is not possible as an action
-      actions = {k: not v for k, v in cell.walls.items()}      
+      actions = self.maze.get_open_sides( x, y )
     else:
       # initially start with all actions being possible
       actions = {'N':True,'E':True,'S':True,'W':True}
@@ -229,6 +263,24 @@ class GridLevel():
     # if no puddle then guaranteed to reach target
     return 1.
 
+  def get_puddle_sizes( self ):
+    ''' get the size of the puddle in every state of the level as a (height,width) array '''
+    if self.splashes is not None:
+      return np.array(self.splashes, dtype=np.uint8)
+    return np.zeros((self.height,self.width), dtype=np.uint8)
+
+  def get_action_rewards( self ):
+    ''' get the reward for taking an action that moves to each state of the level '''
+    return -np.power(2., self.get_puddle_sizes())
+
+  def get_transition_probabilities( self ):
+    ''' get the probability of moving to the target state when starting in each state of the level '''
+    puddle_sizes = self.get_puddle_sizes()
+    probabilities = np.ones(puddle_sizes.shape)
+    probabilities[puddle_sizes == Puddle.Small] = 0.6
+    probabilities[puddle_sizes == Puddle.Large] = 0.4
+    return probabilities
+
   def get_next_state_position( self, x, y, direction ):
     ''' given the current state position and direction calculate the postion of the next state '''
     next_pos = []    
@@ -289,6 +341,10 @@ class GridLevel():
     self.draw_level(add_maze)
         
   def draw_level(self,add_maze):        
+    from ipycanvas import hold_canvas
+
+    # the cells are drawn again in full after the level is redrawn
+    self.clear_drawn_cells()
     self.draw_level_base()
     
     canvas = self.canvases[1]
@@ -313,12 +369,16 @@ class GridLevel():
     y = (grid_pos[1] * self.cell_pixels) + self.padding + yoff   
     return x,y   
   
-  def draw_maze(self,canvas):    
+  def create_maze(self):
+    ''' generate a new maze for the walls of the grid '''
     self.maze = Maze(self.width, self.height, self.start[0], self.start[1], seed = self.maze_seed)
-    self.maze.make_maze()        
+    self.maze.make_maze(self.maze_algorithm)
+    self.mdp = None
     if self.debug_maze: 
       self.maze.write_svg(os.path.join(self.working_directory, "maze.svg"))
 
+  def draw_maze(self,canvas):    
+    self.create_maze()
     self.maze.write_to_canvas( canvas,
                                self.height*self.cell_pixels,
                                self.padding)       
@@ -418,6 +478,8 @@ class GridLevel():
           self.draw_splash( canvas, col, row, self.splashes[row][col] )    
 
   def draw_splash(self,canvas,x,y,puddle_type):
+    from ipycanvas import Canvas, hold_canvas
+    from ipywidgets import Image
 
     if puddle_type > 0:
 
@@ -453,6 +515,7 @@ class GridLevel():
   def draw_MDP(self):
     ''' draw the level as an MDP '''
 
+    from ipycanvas import RoughCanvas, hold_canvas
     canvas = RoughCanvas( width=self.width*150+100, height=self.height*150+100, sync_image_data=True )
 
     line_length = 54
@@ -526,12 +589,16 @@ class GridLevel():
 
         
   def create_canvases(self):        
+    from ipycanvas import MultiCanvas
                 
     self.canvases = MultiCanvas(n_canvases=self.num_canvases, 
                                 width=self.total_width, 
                                 height=self.total_height, 
                                 sync_image_data=True)               
 
+    # nothing has been drawn on the new canvases
+    self.clear_drawn_cells()
+
   def draw_rect(self, canvas_index, width, height, color):
     canvas = self.canvases[canvas_index]
     canvas.fill_style = color
@@ -542,37 +609,83 @@ class GridLevel():
     self.show_cell_text( row, col, f"{value:0.1f}", color, back_color )
         
   def show_cell_text( self, row, col, value, color = '#002', back_color = None ):
-    ''' display the given value in the specified cell '''     
-            
-    if (self.fill_center == False 
-    or not ((row >= 1 and row <= self.height-2) and (col >= 1 and col <= self.width-2))):    
-      x,y = self.grid_to_pixels( [col,row], self.padding, self.padding )    
+    ''' display the given value in the specified cell '''
+
+    if self.headless: return
+    from ipycanvas import hold_canvas
+
+    canvas = self.canvases[3]
+    with hold_canvas(canvas):
+      self.draw_cell_text( canvas, row, col, value, color, back_color )
+
+  def draw_cell_text( self, canvas, row, col, value, color, back_color ):
+    ''' draw the text in the specified cell, unless the same text is already shown there '''
+
+    if (self.fill_center == False
+    or not ((row >= 1 and row <= self.height-2) and (col >= 1 and col <= self.width-2))):
+
+      text = (f"{value}", color, back_color)
+      if self.drawn_text.get((col,row)) == text: return
+      self.drawn_text[(col,row)] = text
+
+      # clearing behind the text erases the middle of any arrows, so they'll need to be redrawn
+      self.drawn_directions.pop((col,row), None)
+
+      x,y = self.grid_to_pixels( [col,row], self.padding, self.padding )
       self.set_center(x,y) # calculate the center of this cell
 
-      canvas = self.canvases[3]
-      with hold_canvas(canvas):                
-        canvas.clear_rect(self.cx-18,self.cy-18,36,36) 
+      canvas.clear_rect(self.cx-18,self.cy-18,36,36)
 
-        if back_color is not None:
-          canvas.fill_style = back_color
-          canvas.fill_rect(self.cx-18,self.cy-10,36,20)      
+      if back_color is not None:
+        canvas.fill_style = back_color
+        canvas.fill_rect(self.cx-18,self.cy-10,36,20)
+
+      canvas.fill_style = color
+      canvas.text_align = 'center'
+      canvas.font = 'bold 14px sans-serif'
+      canvas.fill_text(f"{value}", self.cx, self.cy+5)
+
+  def clear_drawn_cells(self):
+    ''' forget the text and directions drawn in the cells, so that every cell is drawn on the next update
+        - this is needed after clearing the cells directly on the canvas
+    '''
+    self.drawn_text = {}
+    self.drawn_directions = {}
+
+  def forget_drawn_area(self, x, y, width, height):
+    ''' forget the text and directions drawn in any cell that overlaps the given area of the canvas '''
+    for drawn in (self.drawn_text, self.drawn_directions):
+      for cell in list(drawn):
+        cell_x,cell_y = self.grid_to_pixels( cell, self.padding, self.padding )
+        if (cell_x < x+width and x < cell_x+self.cell_pixels
+        and cell_y < y+height and y < cell_y+self.cell_pixels):
+          del drawn[cell]
+
+  def clear_values_area(self, x, y, width, height):
+    ''' clear an area of the canvas that shows the values and directions, so that any cells within
+        the area are drawn again on the next update '''
+    if self.headless: return
+    self.canvases[3].clear_rect(x, y, width, height)
+    self.forget_drawn_area(x, y, width, height)
 
-        canvas.fill_style = color
-        canvas.text_align = 'center'
-        canvas.font = 'bold 14px sans-serif'
-        canvas.fill_text(f"{value}", self.cx, self.cy+5)    
-            
   def show_values(self,values):
-    ''' display the cell values on the grid '''
-    for row in range(values.shape[0]):
-      for col in range(values.shape[1]):
-        back_color = "rgba(40,40,40,0.7)"
-        color = '#fff'
-        if col == self.start[0] and row == self.start[1]: 
-          back_color = "rgba(0, 0, 0, 0.6)"          
-        if col == self.end[0] and row == self.end[1]:                         
-          back_color = "rgba(0, 0, 0, 0.8)"            
-        self.show_cell_value( row, col, values[row][col], color, back_color )          
+    ''' display the cell values on the grid
+        - all cells are drawn together and only the cells whose displayed value has changed are redrawn
+    '''
+    if self.headless: return
+    from ipycanvas import hold_canvas
+
+    canvas = self.canvases[3]
+    with hold_canvas(canvas):
+      for row in range(values.shape[0]):
+        for col in range(values.shape[1]):
+          back_color = "rgba(40,40,40,0.7)"
+          color = '#fff'
+          if col == self.start[0] and row == self.start[1]:
+            back_color = "rgba(0, 0, 0, 0.6)"
+          if col == self.end[0] and row == self.end[1]:
+            back_color = "rgba(0, 0, 0, 0.8)"
+          self.draw_cell_text( canvas, row, col, f"{values[row][col]:0.1f}", color, back_color )
           
 
   '''
@@ -580,12 +693,21 @@ class GridLevel():
   '''
 
   def draw_directions(self, canvas, col, row, directions, color):
-    ''' draw arrow in each direction in supplied list '''
-    x,y = self.grid_to_pixels( [row,col], self.padding, self.padding )    
-    canvas.clear_rect(x,y,self.cell_pixels,self.cell_pixels) 
-    self.arrows.draw(canvas,x,y,directions,color)           
+    ''' draw arrow in each direction in supplied list, unless the same arrows are already shown '''
+    arrows = (tuple(directions), color)
+    if self.drawn_directions.get((row,col)) == arrows: return
+    self.drawn_directions[(row,col)] = arrows
+
+    # drawing the arrows clears the whole cell, so any text will need to be redrawn
+    self.drawn_text.pop((row,col), None)
+
+    x,y = self.grid_to_pixels( [row,col], self.padding, self.padding )
+    canvas.clear_rect(x,y,self.cell_pixels,self.cell_pixels)
+    self.arrows.draw(canvas,x,y,directions,color)
           
   def show_cell_directions(self,col,row,directions,color = '#00008b'):    
+    if self.headless: return
+    from ipycanvas import hold_canvas
     canvas = self.canvases[3]
     with hold_canvas(canvas): 
       self.draw_directions(canvas, col, row, directions, color)     
@@ -616,14 +738,21 @@ class GridLevel():
     if dir_value & Direction.West:  dir_list.append( Direction.West )    
     return dir_list
           
-  def show_directions(self,directions):   
-    ''' display the cell directions given in the supplied array '''
-    for row in range(directions.shape[0]):
-      for col in range(directions.shape[1]):
-        # dont show directions on the exit
-        if col != self.end[0] or row != self.end[1]:
-          dir_list = self.get_direction_list(directions,row,col)
-          self.show_cell_directions(row,col,dir_list,color='#0000cc')
+  def show_directions(self,directions):
+    ''' display the cell directions given in the supplied array
+        - all cells are drawn together and only the cells whose directions have changed are redrawn
+    '''
+    if self.headless: return
+    from ipycanvas import hold_canvas
+
+    canvas = self.canvases[3]
+    with hold_canvas(canvas):
+      for row in range(directions.shape[0]):
+        for col in range(directions.shape[1]):
+          # dont show directions on the exit
+          if col != self.end[0] or row != self.end[1]:
+            dir_list = self.get_direction_list(directions,row,col)
+            self.draw_directions(canvas,row,col,dir_list,color='#0000cc')
 
 
   def get_direction_list_value( self, direction_list ):
@@ -698,17 +827,24 @@ class GridLevel():
                        text_align='left',
                        text_baseline='top'):                       
     ''' add information text in the side panel '''
+    if self.headless: return
+    from ipycanvas import hold_canvas
 
     canvas = self.canvases[canvas_id]
     with hold_canvas(canvas): 
       
       # if a central area is being used to display messages clear this
       if self.fill_center == True:
-        canvas.clear_rect(70,70,190,56)      
+        area = (70,70,190,56)
+        canvas.clear_rect(*area)      
       else:
-        canvas.clear_rect(x,y-5,190,20)        
+        area = (x,y-5,190,20)
+        canvas.clear_rect(*area)        
         canvas.fill_style = 'white'
-        canvas.fill_rect(x,y-5,190,20) 
+        canvas.fill_rect(*area) 
+
+      # text written over the cells of the values canvas replaces anything drawn in them
+      if canvas_id == 3: self.forget_drawn_area(*area)
 
       canvas.fill_style = color
       canvas.text_align = text_align
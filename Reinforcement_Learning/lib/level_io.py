@@ -0,0 +1,100 @@
+import numpy as np
+from grid_level import GridLevel
+from maze import Maze
+
+
+''' the level file format:
+    - a fixed size header, holding the dimensions, start, end and the contents of the file
+    - the (height,width) uint8 grid of maze wall bits, if the level has a maze
+    - the (height,width) uint8 grid of puddle sizes, if the level has splashes
+'''
+LEVEL_MAGIC = b'BRLV'
+LEVEL_VERSION = 1
+
+LEVEL_HEADER = np.dtype([('magic','S4'),
+                         ('version','<u2'),
+                         ('flags','<u2'),
+                         ('width','<u4'),
+                         ('height','<u4'),
+                         ('start','<u4',(2,)),
+                         ('end','<u4',(2,))])
+
+# the flags that describe what the level contains
+HAS_MAZE = 1
+HAS_SPLASHES = 2
+FILL_CENTER = 4
+
+
+def save_level(level, file_name):
+  ''' write the dimensions, start, end, maze walls and puddles of a grid level to a binary file '''
+
+  flags = 0
+  if level.maze is not None: flags |= HAS_MAZE
+  if level.splashes is not None: flags |= HAS_SPLASHES
+  if level.fill_center: flags |= FILL_CENTER
+
+  header = np.zeros((), dtype=LEVEL_HEADER)
+  header['magic'] = LEVEL_MAGIC
+  header['version'] = LEVEL_VERSION
+  header['flags'] = flags
+  header['width'] = level.width
+  header['height'] = level.height
+  header['start'] = level.start
+  header['end'] = level.end
+
+  with open(file_name, 'wb') as f:
+    f.write(header.tobytes())
+    if flags & HAS_MAZE:
+      f.write(np.ascontiguousarray(level.maze.walls, dtype=np.uint8).tobytes())
+    if flags & HAS_SPLASHES:
+      f.write(level.get_puddle_sizes().tobytes())
+
+
+def read_level(file_name):
+  ''' read the header of a level file and memory-map its wall and puddle grids
+      - the grids are mapped copy-on-write, so they can be changed without altering the file
+      - returns a dictionary of the level's settings, with 'walls' and 'splashes' set to None if not in the file
+  '''
+  header = np.fromfile(file_name, dtype=LEVEL_HEADER, count=1)
+  if len(header) == 0 or header['magic'][0] != LEVEL_MAGIC:
+    raise ValueError(f"'{file_name}' is not a level file")
+  header = header[0]
+  if header['version'] != LEVEL_VERSION:
+    raise ValueError(f"'{file_name}' has level file version {header['version']}, expected {LEVEL_VERSION}")
+
+  width, height, flags = int(header['width']), int(header['height']), int(header['flags'])
+  level = {'width': width,
+           'height': height,
+           'start': header['start'].tolist(),
+           'end': header['end'].tolist(),
+           'fill_center': bool(flags & FILL_CENTER),
+           'walls': None,
+           'splashes': None}
+
+  offset = LEVEL_HEADER.itemsize
+  if flags & HAS_MAZE:
+    level['walls'] = np.memmap(file_name, dtype=np.uint8, mode='c', offset=offset, shape=(height,width))
+    offset += width * height
+  if flags & HAS_SPLASHES:
+    level['splashes'] = np.memmap(file_name, dtype=np.uint8, mode='c', offset=offset, shape=(height,width))
+
+  return level
+
+
+def load_level(file_name, **kwargs):
+  ''' create a grid level from a level file
+      - the maze walls and puddles are used straight from the memory-mapped file
+      - any other keyword arguments are passed to the GridLevel
+  '''
+  settings = read_level(file_name)
+  level = GridLevel(settings['width'], settings['height'],
+                    start = settings['start'],
+                    end = settings['end'],
+                    fill_center = settings['fill_center'],
+                    **kwargs)
+
+  if settings['walls'] is not None:
+    level.set_maze(Maze.from_walls(settings['walls'], *settings['start']))
+  if settings['splashes'] is not None:
+    level.add_splashes(settings['splashes'])
+  return level
@@ -0,0 +1,154 @@
+import numpy as np
+from direction import Direction
+
+
+''' the order of the actions in the compiled arrays, matching the order of the Direction flags '''
+ACTIONS = ['N','E','S','W']
+ACTION_DIRECTIONS = [Direction.North, Direction.East, Direction.South, Direction.West]
+
+
+''' a grid level compiled into arrays of next states, transition probabilities and rewards '''
+class LevelMDP():
+
+  def __init__(self, level):
+    self.width = level.width
+    self.height = level.height
+    self.num_states = level.width * level.height
+    self.num_actions = len(ACTIONS)
+
+    # states are numbered row by row, so a state index is given by: y * width + x
+    self.end_state = self.state_index(level.get_end())
+
+    self.compile(level)
+
+  def state_index(self, pos):
+    ''' get the index of the state at the supplied (x,y) position '''
+    return pos[1] * self.width + pos[0]
+
+  def compile(self, level):
+    ''' store the actions, next states, rewards and transition probabilities of the level in arrays '''
+
+    S = self.num_states
+    A = self.num_actions
+
+    # true if the action is available in the state
+    self.actions = np.zeros((S,A), dtype=bool)
+
+    # the index of the state reached by moving in the direction of each action
+    # - an unavailable action leaves the robot in its current state
+    self.next_states = np.repeat(np.arange(S)[:,np.newaxis], A, axis=1)
+
+    # true if the level returns any actions for the state (i.e. the state isn't the exit or outside the level)
+    self.has_actions = np.zeros(S, dtype=bool)
+
+    # the reward for moving into each state and the probability of reaching the target when leaving it
+    self.rewards = level.get_action_rewards().ravel()
+    target_probability = level.get_transition_probabilities().ravel()
+
+    # the actions of a maze can be read straight from its wall array
+    if level.maze is not None:
+      self.compile_walls(level.maze.walls)
+    else:
+      self.compile_cells(level)
+
+    self.calculate_probabilities(target_probability)
+
+  def compile_walls(self, walls):
+    ''' get the available actions and next states from the wall bits of a maze '''
+    states = np.arange(self.num_states)
+    walls = walls.ravel()
+    x = states % self.width
+    y = states // self.width
+
+    # the change in state index and whether the move stays on the grid, for each action
+    moves = {Direction.North: (-self.width, y > 0),
+             Direction.East:  (1, x < self.width-1),
+             Direction.South: (self.width, y < self.height-1),
+             Direction.West:  (-1, x > 0)}
+
+    for a, direction in enumerate(ACTION_DIRECTIONS):
+      offset, on_grid = moves[direction]
+      self.actions[:,a] = ((walls & int(direction)) == 0) & on_grid
+      self.next_states[:,a] = np.where(self.actions[:,a], states + offset, states)
+
+    # every state, other than the exit, has a set of actions even if they're all blocked by walls
+    self.has_actions[:] = True
+    self.has_actions[self.end_state] = False
+    self.actions[self.end_state] = False
+    self.next_states[self.end_state] = self.end_state
+
+  def compile_cells(self, level):
+    ''' query the level once for every state to get the available actions and next states '''
+    for y in range(self.height):
+      for x in range(self.width):
+        s = self.state_index([x,y])
+        actions = level.get_available_actions( x, y )
+        self.has_actions[s] = len(actions) > 0
+        for a, direction in enumerate(ACTIONS):
+          if actions.get(direction, False):
+            self.actions[s,a] = True
+            next_pos = level.get_next_state_position( x, y, direction )
+            self.next_states[s,a] = self.state_index(next_pos)
+
+  def calculate_probabilities(self, target_probability):
+    ''' calculate the probability of moving in each direction when taking each action:
+        - the target is reached with the state's transition probability
+        - the remaining probability is shared equally between the other available actions
+        - if no other actions are available the target is always reached
+    '''
+    self.action_counts = self.actions.sum(axis=1)
+    num_alternatives = self.action_counts - 1
+
+    target = np.where(num_alternatives == 0, 1., target_probability)
+    other = np.divide(1. - target, num_alternatives,
+                      out=np.zeros(self.num_states), where=num_alternatives > 0)
+
+    # probabilities[s,a,b] = probability of moving in direction 'b' when taking action 'a' in state 's'
+    available = self.actions[:,:,np.newaxis] & self.actions[:,np.newaxis,:]
+    self.probabilities = available * other[:,np.newaxis,np.newaxis]
+    diagonal = np.arange(self.num_actions)
+    self.probabilities[:,diagonal,diagonal] = self.actions * target[:,np.newaxis]
+
+  def get_policy_actions(self, policy):
+    ''' get the available actions that are also part of the supplied policy of Direction flags '''
+    policy = np.asarray(policy).reshape(self.num_states, 1)
+    bits = np.array([int(direction) for direction in ACTION_DIRECTIONS])
+    return self.actions & ((policy & bits) != 0)
+
+  def get_next_state_returns(self, values, discount_factor):
+    ''' the reward plus discounted value of the state reached by moving in each direction '''
+    next_states = self.next_states
+    return self.rewards[next_states] + discount_factor * np.ravel(values)[next_states]
+
+  def get_action_values(self, values, discount_factor):
+    ''' the expected return of taking each action in each state, given the current state values
+        - the value of an action that isn't available is zero
+    '''
+    returns = self.get_next_state_returns(values, discount_factor)
+    return np.einsum('sab,sb->sa', self.probabilities, returns)
+
+  def get_policy_probabilities(self, policy=None):
+    ''' get the probability of moving in each direction from each state under the supplied policy
+        - with no policy all available actions are equally likely and always reach their target
+        - otherwise the policy must specify a single available action for every state that has actions
+    '''
+    if policy is None:
+      counts = self.action_counts[:,np.newaxis]
+      return np.divide(self.actions, counts, out=np.zeros((self.num_states,self.num_actions)), where=counts > 0)
+
+    chosen = self.get_policy_actions(policy)
+    num_chosen = chosen.sum(axis=1)
+    invalid = np.flatnonzero(self.has_actions & (num_chosen != 1))
+    if len(invalid):
+      y, x = divmod(invalid[0], self.width)
+      chosen_actions = [ACTIONS[a] for a in np.flatnonzero(chosen[invalid[0]])]
+      raise AssertionError(f"Policy must have exactly one action ({x},{y}) actions = {chosen_actions}")
+
+    # select the row of the transition tensor for the chosen action of each state
+    probabilities = self.probabilities[np.arange(self.num_states), chosen.argmax(axis=1)]
+    probabilities[~self.has_actions] = 0
+    return probabilities
+
+  def get_expected_rewards(self, probabilities):
+    ''' the expected reward of moving from each state with the supplied direction probabilities '''
+    return (probabilities * self.rewards[self.next_states]).sum(axis=1)
@@ -3,31 +3,85 @@
 # Christian Hill, April 2017.
 
 import random
+import timeit
+from collections.abc import MutableMapping
+import numpy as np
+from direction import Direction
+
+# The bit used for the wall on each side of a cell, matching the Direction flags.
+wall_bits = {'N': int(Direction.North), 'S': int(Direction.South),
+             'E': int(Direction.East), 'W': int(Direction.West)}
+all_walls = int(Direction.All)
+
+
+class CellWalls(MutableMapping):
+    """A dict-like view of the walls of a single cell in a wall bit array.
+    Setting a wall to True or False sets or clears its bit in the array.
+    """
+
+    def __init__(self, walls, x, y):
+        self.array, self.x, self.y = walls, x, y
+
+    def __getitem__(self, wall):
+        return bool(self.array[self.y, self.x] & wall_bits[wall])
+
+    def __setitem__(self, wall, value):
+        if value:
+            self.array[self.y, self.x] |= wall_bits[wall]
+        else:
+            self.array[self.y, self.x] &= ~wall_bits[wall] & all_walls
+
+    def __delitem__(self, wall):
+        raise TypeError("the walls of a cell can't be removed, set them to False instead")
+
+    def __iter__(self):
+        return iter(wall_bits)
+
+    def __len__(self):
+        return len(wall_bits)
+
+    def __repr__(self):
+        return repr(dict(self))
+
 
 class Cell:
     """A cell in the maze.
     A maze "Cell" is a point in the grid which may be surrounded by walls to
     the north, east, south or west.
+    The walls are stored as bits in the wall array of the maze, so a Cell is
+    only a view onto its position in this array.
     """
 
     # A wall separates a pair of cells in the N-S or W-E directions.
     wall_pairs = {'N': 'S', 'S': 'N', 'E': 'W', 'W': 'E'}
 
-    def __init__(self, x, y, no_walls = False):
-        """Initialize the cell at (x,y). At first it is surrounded by walls."""
+    def __init__(self, x, y, no_walls = False, walls = None):
+        """Initialize the cell at (x,y). At first it is surrounded by walls.
+        If the wall array of a maze is given the cell is a view of its entry
+        in that array, otherwise the cell keeps its own walls.
+        """
 
         self.x, self.y = x, y
 
-        if no_walls:
-          self.walls = {'N': False, 'S': False, 'E': False, 'W': False }
+        if walls is None:
+            walls = np.full((1, 1), 0 if no_walls else all_walls, dtype=np.uint8)
+            self._walls = CellWalls(walls, 0, 0)
         else:
-          self.walls = {'N': True, 'S': True, 'E': True, 'W': True}
+            self._walls = CellWalls(walls, x, y)
+
+    @property
+    def walls(self):
+        return self._walls
+
+    @walls.setter
+    def walls(self, walls):
+        for wall, value in walls.items():
+            self._walls[wall] = value
 
     def has_all_walls(self):
         """Does this cell still have all its walls?"""
 
-        # check if all items in the list are true
-        return all(self.walls.values())
+        return self._walls.array[self._walls.y, self._walls.x] == all_walls
 
     def knock_down_wall(self, other, wall):
         """Knock down the wall between cells self and other."""
@@ -43,41 +97,68 @@ class Cell:
 
 
 class Maze:
-    """A Maze, represented as a grid of cells."""
+    """A Maze, represented as a grid of cells.
+    The walls of every cell are held in a single (ny, nx) uint8 array, with
+    a bit set for each side of the cell that has a wall.
+    """
+
+    # The maze generation methods that can be selected by name in make_maze.
+    algorithms = {'depth_first': 'make_depth_first_maze',
+                  'kruskal': 'make_kruskal_maze',
+                  'wilson': 'make_wilson_maze',
+                  'binary_tree': 'make_binary_tree_maze',
+                  'sidewinder': 'make_sidewinder_maze'}
 
-    def __init__(self, nx, ny, ix=0, iy=0, seed = None, no_walls = False):
+    def __init__(self, nx, ny, ix=0, iy=0, seed = None, no_walls = False, walls = None):
         """Initialize the maze grid.
         The maze consists of nx x ny cells and will be constructed starting
         at the cell indexed at (ix, iy).
+        If an existing (ny, nx) wall array is given it is used as it is,
+        without being copied.
         """
 
-        # set the seed for random if want to produce consistent maze
-        if seed is not None: random.seed(seed)
-        
+        # the maze has its own random generators, so setting the seed to produce
+        # a consistent maze doesn't change the random state of anything else
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+
         self.nx, self.ny = nx, ny
         self.ix, self.iy = ix, iy
-        self.maze_map = [[Cell(x, y, no_walls) for y in range(ny)] for x in range(nx)]
+        if walls is not None:
+            self.walls = walls
+            return
+
+        self.walls = np.full((ny, nx), 0 if no_walls else all_walls, dtype=np.uint8)
 
         if no_walls:
           self.add_boundary_walls()
 
+    @classmethod
+    def from_walls(cls, walls, ix=0, iy=0, seed = None):
+        """Create a maze from an existing (ny, nx) array of wall bits, such
+        as one that has been memory-mapped from a file."""
+        ny, nx = walls.shape
+        return cls(nx, ny, ix, iy, seed = seed, walls = walls)
+
     def add_boundary_walls(self):
         """ add walls around the outside of the level """
-        for y in range(self.ny):
-          for x in range(self.nx):
-            if y == 0:
-              self.cell_at(x, y).walls['N'] = True
-            elif (y+1) == self.ny:
-              self.cell_at(x, y).walls['S'] = True
-
-            if x == 0:
-              self.cell_at(x, y).walls['W'] = True
-            elif (x+1) == self.nx:
-              self.cell_at(x, y).walls['E'] = True              
+        self.walls[0, :] |= wall_bits['N']
+        self.walls[-1, :] |= wall_bits['S']
+        self.walls[:, 0] |= wall_bits['W']
+        self.walls[:, -1] |= wall_bits['E']
 
     def cell_at(self, x, y):
         """Return the Cell object at (x,y)."""
-        return self.maze_map[x][y]
+        return Cell(x, y, walls=self.walls)
+
+    def has_wall(self, x, y, wall):
+        """Is there a wall on the given side of the cell at (x,y)?"""
+        return bool(self.walls[y, x] & wall_bits[wall])
+
+    def get_open_sides(self, x, y):
+        """Return a dict of the sides of the cell at (x,y) that don't have a wall."""
+        cell_walls = int(self.walls[y, x])
+        return {wall: not (cell_walls & bit) for wall, bit in wall_bits.items()}
     
     def dimensions(self):
         return self.nx, self.ny
@@ -89,14 +170,14 @@ class Maze:
         for y in range(self.ny):
             maze_row = ['|']
             for x in range(self.nx):
-                if self.maze_map[x][y].walls['E']:
+                if self.walls[y, x] & wall_bits['E']:
                     maze_row.append(' |')
                 else:
                     maze_row.append('  ')
             maze_rows.append(''.join(maze_row))
             maze_row = ['|']
             for x in range(self.nx):
-                if self.maze_map[x][y].walls['S']:
+                if self.walls[y, x] & wall_bits['S']:
                     maze_row.append('-+')
                 else:
                     maze_row.append(' +')
@@ -141,10 +222,10 @@ class Maze:
             # general, of course).
             for x in range(self.nx):
                 for y in range(self.ny):
-                    if self.cell_at(x, y).walls['S']:
+                    if self.walls[y, x] & wall_bits['S']:
                         x1, y1, x2, y2 = x * scx, (y + 1) * scy, (x + 1) * scx, (y + 1) * scy
                         write_wall(f, x1, y1, x2, y2)
-                    if self.cell_at(x, y).walls['E']:
+                    if self.walls[y, x] & wall_bits['E']:
                         x1, y1, x2, y2 = (x + 1) * scx, y * scy, (x + 1) * scx, (y + 1) * scy
                         write_wall(f, x1, y1, x2, y2)
             # Draw the North and West maze border, which won't have been drawn
@@ -169,29 +250,209 @@ class Maze:
                     neighbours.append((direction, neighbour))
         return neighbours
 
-    def make_maze(self):
-        # Total number of cells.
-        n = self.nx * self.ny
+    def make_maze(self, algorithm = 'depth_first'):
+        """Knock down walls to make a maze, using the named algorithm."""
+
+        if algorithm not in Maze.algorithms:
+            raise ValueError(f"unknown maze algorithm '{algorithm}', "
+                             f"choose from {list(Maze.algorithms)}")
+
+        # every algorithm starts from a grid with all of its walls
+        self.walls.fill(all_walls)
+        getattr(self, Maze.algorithms[algorithm])()
+
+    def carve_passages(self, cells, wall):
+        """Knock down the given wall of every cell where 'cells' is True, along
+        with the matching wall of the neighbouring cell."""
+
+        # the cells that have a neighbour on the given side and the neighbours themselves
+        sources, neighbours = {'N': ((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+                               'S': ((slice(None, -1), slice(None)), (slice(1, None), slice(None))),
+                               'E': ((slice(None), slice(None, -1)), (slice(None), slice(1, None))),
+                               'W': ((slice(None), slice(1, None)), (slice(None), slice(None, -1)))}[wall]
+
+        cells = cells[sources]
+        self.walls[sources] &= ~(cells.astype(np.uint8) * np.uint8(wall_bits[wall]))
+        self.walls[neighbours] &= ~(cells.astype(np.uint8) * np.uint8(wall_bits[Cell.wall_pairs[wall]]))
+
+    def set_walls(self, walls):
+        """Copy the walls, given as a bytearray of one byte per cell, into the
+        wall array. The array is updated in place, rather than replaced, since
+        the cell views and any memory-mapped file share it."""
+
+        self.walls[...] = np.frombuffer(walls, dtype=np.uint8).reshape(self.ny, self.nx)
+
+    def make_depth_first_maze(self):
+        """Make a maze with a randomized depth-first search from (ix, iy).
+        The neighbours are tried in the same order, and chosen with the same
+        calls to the random generator, as the original cell based version, so
+        a seed still produces the same maze.
+        """
+
+        nx, n = self.nx, self.nx * self.ny
+        walls = bytearray(self.walls.tobytes())
+        visited = bytearray(n)
+        choice = self.random.choice
+        W, E, S, N = wall_bits['W'], wall_bits['E'], wall_bits['S'], wall_bits['N']
+
         cell_stack = []
-        current_cell = self.cell_at(self.ix, self.iy)
+        current = self.iy * nx + self.ix
+        visited[current] = 1
         # Total number of visited cells during maze construction.
         nv = 1
 
         while nv < n:
-            neighbours = self.find_valid_neighbours(current_cell)
+            x = current % nx
+            neighbours = []
+            if x > 0 and not visited[current - 1]:
+                neighbours.append((W, E, current - 1))
+            if x < nx - 1 and not visited[current + 1]:
+                neighbours.append((E, W, current + 1))
+            if current + nx < n and not visited[current + nx]:
+                neighbours.append((S, N, current + nx))
+            if current >= nx and not visited[current - nx]:
+                neighbours.append((N, S, current - nx))
 
             if not neighbours:
                 # We've reached a dead end: backtrack.
-                current_cell = cell_stack.pop()
+                current = cell_stack.pop()
                 continue
 
             # Choose a random neighbouring cell and move to it.
-            direction, next_cell = random.choice(neighbours)
-            current_cell.knock_down_wall(next_cell, direction)
-            cell_stack.append(current_cell)
-            current_cell = next_cell
+            wall, opposite, next_cell = choice(neighbours)
+            walls[current] &= ~wall
+            walls[next_cell] &= ~opposite
+            visited[next_cell] = 1
+            cell_stack.append(current)
+            current = next_cell
             nv += 1
-            
+
+        self.set_walls(walls)
+
+    def make_kruskal_maze(self):
+        """Make a maze by knocking down the walls in a random order, skipping any
+        wall whose two cells are already joined, tracked with a union-find."""
+
+        nx, ny = self.nx, self.ny
+        cells = np.arange(nx * ny).reshape(ny, nx)
+
+        # every interior wall, as the cell on its west or north side and the cell beyond
+        east_walls = (cells[:, :-1].ravel(), cells[:, 1:].ravel())
+        south_walls = (cells[:-1, :].ravel(), cells[1:, :].ravel())
+        first = np.concatenate((east_walls[0], south_walls[0]))
+        second = np.concatenate((east_walls[1], south_walls[1]))
+        order = self.rng.permutation(len(first))
+
+        parent = list(range(nx * ny))
+        carved = bytearray(len(first))
+        joined = 1
+        for wall, a, b in zip(order.tolist(), first[order].tolist(), second[order].tolist()):
+            # find the root of each cell's set, halving the path as we go
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            while parent[b] != b:
+                parent[b] = parent[parent[b]]
+                b = parent[b]
+
+            if a != b:
+                parent[b] = a
+                carved[wall] = 1
+                joined += 1
+                if joined == nx * ny: break
+
+        carved = np.frombuffer(carved, dtype=bool)
+        number_of_east_walls = len(east_walls[0])
+        east = np.zeros((ny, nx), dtype=bool)
+        east[:, :-1] = carved[:number_of_east_walls].reshape(ny, nx - 1)
+        south = np.zeros((ny, nx), dtype=bool)
+        south[:-1, :] = carved[number_of_east_walls:].reshape(ny - 1, nx)
+        self.carve_passages(east, 'E')
+        self.carve_passages(south, 'S')
+
+    def make_wilson_maze(self):
+        """Make a maze from loop-erased random walks, which picks uniformly from
+        all possible mazes. Starting from (ix, iy), each cell not yet in the maze
+        walks at random until it reaches the maze and the walk, without its
+        loops, is then added to the maze."""
+
+        nx, n = self.nx, self.nx * self.ny
+        walls = bytearray(self.walls.tobytes())
+        in_maze = bytearray(n)
+        in_maze[self.iy * nx + self.ix] = 1
+        choice = self.random.choice
+        W, E, S, N = wall_bits['W'], wall_bits['E'], wall_bits['S'], wall_bits['N']
+
+        # the direction last taken out of each cell during the current walk
+        # - following these from the start of the walk erases any loops
+        exits = [None] * n
+
+        for start in range(n):
+            if in_maze[start]: continue
+
+            current = start
+            while not in_maze[current]:
+                x = current % nx
+                moves = []
+                if x > 0: moves.append((W, E, current - 1))
+                if x < nx - 1: moves.append((E, W, current + 1))
+                if current + nx < n: moves.append((S, N, current + nx))
+                if current >= nx: moves.append((N, S, current - nx))
+                exits[current] = choice(moves)
+                current = exits[current][2]
+
+            current = start
+            while not in_maze[current]:
+                wall, opposite, next_cell = exits[current]
+                walls[current] &= ~wall
+                walls[next_cell] &= ~opposite
+                in_maze[current] = 1
+                current = next_cell
+
+        self.set_walls(walls)
+
+    def make_binary_tree_maze(self):
+        """Make a maze by knocking down either the north or the east wall of
+        every cell, at random, for the whole grid at once."""
+
+        carve_north = self.rng.random((self.ny, self.nx)) < 0.5
+
+        # the cells in the east column can only go north and those in the top row can only go east
+        carve_north[:, -1] = True
+        carve_north[0, :] = False
+        carve_east = ~carve_north
+        carve_east[0, -1] = False
+
+        self.carve_passages(carve_north, 'N')
+        self.carve_passages(carve_east, 'E')
+
+    def make_sidewinder_maze(self):
+        """Make a maze by splitting each row into random runs of cells joined to
+        the east, and linking each run to the row above through one of its cells.
+        All rows below the top row are done at once."""
+
+        nx, ny = self.nx, self.ny
+
+        # the top row is a single passage
+        carve_east = np.zeros((ny, nx), dtype=bool)
+        carve_east[0, :-1] = True
+
+        # each run ends where it is closed at random, or at the east edge
+        close_run = self.rng.random((ny - 1, nx)) < 0.5
+        close_run[:, -1] = True
+        carve_east[1:] = ~close_run
+
+        # choose one cell from each run to join to the row above
+        run_ends = np.flatnonzero(close_run)
+        run_starts = np.concatenate(([0], run_ends[:-1] + 1))
+        run_lengths = run_ends - run_starts + 1
+        chosen = run_starts + (self.rng.random(len(run_starts)) * run_lengths).astype(int)
+        carve_north = np.zeros((ny, nx), dtype=bool)
+        carve_north[1:].ravel()[chosen] = True
+
+        self.carve_passages(carve_east, 'E')
+        self.carve_passages(carve_north, 'N')
+
     def write_to_canvas(self, canvas, maze_height, maze_padding ): 
         ' draw the maze onto the canvas '
 
@@ -223,14 +484,28 @@ class Maze:
         # general, of course).
         for x in range(self.nx):
             for y in range(self.ny):
-                if self.cell_at(x, y).walls['S']:
+                if self.walls[y, x] & wall_bits['S']:
                     x1, y1, x2, y2 = x * scx, (y + 1) * scy, (x + 1) * scx, (y + 1) * scy
                     draw_wall(x1, y1, x2, y2)
-                if self.cell_at(x, y).walls['E']:
+                if self.walls[y, x] & wall_bits['E']:
                     x1, y1, x2, y2 = (x + 1) * scx, y * scy, (x + 1) * scx, (y + 1) * scy
                     draw_wall(x1, y1, x2, y2)
 
         # Draw the North and West maze border, which won't have been drawn
         # by the procedure above.
         draw_wall(0, 0, 0, height)        
-        draw_wall(0, 0, width, 0)
\ No newline at end of file
+        draw_wall(0, 0, width, 0)
+
+
+def benchmark_make_maze(sizes = (100, 1000, 4000), algorithms = None, seed = 0):
+    """ time each maze generation algorithm on square mazes of the given sizes """
+
+    if algorithms is None: algorithms = list(Maze.algorithms)
+
+    timings = {}
+    for size in sizes:
+        for algorithm in algorithms:
+            maze = Maze(size, size, seed = seed)
+            timings[(algorithm, size)] = timeit.timeit(lambda: maze.make_maze(algorithm), number=1)
+            print(f"{algorithm} {size}x{size}: {timings[(algorithm, size)]:0.3f}s")
+    return timings
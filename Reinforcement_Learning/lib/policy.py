@@ -1,12 +1,13 @@
 import numpy as np
 from direction import Direction
+from level_mdp import ACTION_DIRECTIONS
 
 class Policy():
   
   def __init__(self,level):
     self.level = level
     self.maze = level.maze
-    self.directions = np.zeros((level.height,level.width),dtype=np.int)
+    self.directions = np.zeros((level.height,level.width),dtype=int)
     
   def set_policy(self,directions):
     ''' set the policy (i.e. the action to take in each state) '''
@@ -19,35 +20,43 @@ class Policy():
     self.directions = self.calculate_greedy_directions(values)
     return self.directions
   
-  def update_policy(self,values):
+  def update_policy(self,values,discount_factor=None):
     # if greedy policy specifies more than one action for a state select the action
     # that was in previous policy
     
-    greedy_directions = self.calculate_greedy_directions(values)
+    greedy_directions = self.calculate_greedy_directions(values,discount_factor)
 
-    for row in range(self.directions.shape[0]):
-      for col in range(self.directions.shape[1]):    
-        # if a single direction is specified the value will be a power of 2
-        n = greedy_directions[row,col]  
-        power_of_two = (n & (n-1) == 0) and n != 0   
-        if not power_of_two:      
-          # more than one direction so use direction from last policy
-          greedy_directions[row,col] = self.directions[row,col]    
+    # if a single direction is specified the value will be a power of 2
+    # - otherwise there's more than one direction, or none, so use the direction from the last policy
+    power_of_two = (greedy_directions != 0) & ((greedy_directions & (greedy_directions-1)) == 0)
           
     # update the policy
-    self.directions = greedy_directions
+    self.directions = np.where(power_of_two, greedy_directions, self.directions)
     return self.directions
   
   
-  def calculate_greedy_directions(self,values):    
-    # calculate the directions of all states except the exit  
-    directions = np.zeros((self.level.height,self.level.width),dtype=np.int)
-    end = self.level.get_end()  
-    for y in range(self.level.height):
-      for x in range(self.level.width):
-        if (x != end[0]) or (y != end[1]):
-          directions[y,x] = self.calculate_cell_directions(x,y,values)    
-    return directions
+  def calculate_greedy_directions(self,values,discount_factor=None):    
+    ''' calculate the directions of all states except the exit, as the sum of the Direction
+        flags of the available actions that lead to the neighbouring states with the largest value
+        - if a discount factor is supplied the actions are instead compared by their expected 
+          return, including the rewards and transition probabilities of the level
+    '''
+    mdp = self.level.get_mdp()
+    
+    # the value of the neighbouring state in each direction, masked by the available actions
+    # - the exit has no available actions so gets no directions
+    if discount_factor is None:
+      neighbour_values = np.ravel(values)[mdp.next_states]
+    else:
+      neighbour_values = mdp.get_action_values(values, discount_factor)
+    neighbour_values[~mdp.actions] = float('-inf')
+    best_value = neighbour_values.max(axis=1, keepdims=True)
+    
+    # values below the initial best value of a cell are never selected
+    greedy = mdp.actions & (neighbour_values == best_value) & (best_value >= -1000000)
+    bits = np.array([int(direction) for direction in ACTION_DIRECTIONS])
+    directions = (greedy * bits).sum(axis=1)
+    return directions.reshape((self.level.height,self.level.width))
           
   def calculate_cell_directions(self,x,y,values):
     actions = self.level.get_available_actions(x,y)
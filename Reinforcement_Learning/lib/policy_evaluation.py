@@ -1,3 +1,4 @@
+import warnings
 import numpy as np
 from direction import Direction
 
@@ -9,12 +10,23 @@ class PolicyEvaluation():
   policy = None
   discount_factor = 1
   
-  def __init__(self,level,discount_factor = 1):
+  # arrays describing the current policy, created from the compiled level when first required
+  policy_arrays = None
+  
+  # levels with more states than this are solved with a sparse solver
+  dense_solve_limit = 1000
+  
+  def __init__(self,level,discount_factor = 1,sweep_mode = 'standard'):
     self.level = level
     self.start_values = np.zeros((level.height,level.width))
     self.end_values = np.zeros((level.height,level.width))
     self.discount_factor = discount_factor
     
+    # 'standard' - calculate the value of each state in turn from the start values
+    # 'vectorized' - calculate the values of all states at once from the start values
+    # 'in_place' - update the end values as the sweep progresses (Gauss-Seidel)
+    self.sweep_mode = sweep_mode
+    
   def reset(self):
     self.iterations = 0
     self.start_values = np.zeros((self.level.height,self.level.width))
@@ -47,10 +59,74 @@ class PolicyEvaluation():
             self.end_values[y,x] = self.calculate_policy_cell_value(x,y)   
         
         
+  def get_policy_arrays(self):
+    ''' get the arrays used by the vectorized sweeps for the current policy and compiled level '''
+    
+    mdp = self.level.get_mdp()
+    if (self.policy_arrays is None or self.policy_arrays['mdp'] is not mdp
+        or not self.is_same_policy(self.policy_arrays['policy'])):
+      probabilities = mdp.get_policy_probabilities(self.policy)
+      self.policy_arrays = {
+        'mdp': mdp,
+        'policy': None if self.policy is None else np.array(self.policy),
+        'probabilities': probabilities,
+        'expected_rewards': mdp.get_expected_rewards(probabilities),
+        'next_values': np.zeros((mdp.num_states,mdp.num_actions)),
+      }
+      
+      # moving to a neighbouring cell always changes the parity of (x + y), so the states of each
+      # parity only depend on states of the other parity and can be updated together
+      parity = np.indices((self.level.height,self.level.width)).sum(axis=0).ravel() % 2
+      self.policy_arrays['colours'] = [np.flatnonzero(parity == colour) for colour in (0,1)]
+    return self.policy_arrays
+  
+  def is_same_policy(self, policy):
+    ''' test if the current policy is the same as the supplied copy of a policy
+        - the policy array may have been changed in place since the copy was made
+    '''
+    if self.policy is None or policy is None: return self.policy is policy
+    return np.array_equal(self.policy, policy)
+  
+  def vectorized_sweep(self):
+    ''' calculate the values of all states at once from the start values '''
+    
+    arrays = self.get_policy_arrays()
+    mdp = arrays['mdp']
+    next_values = arrays['next_values']
+    end_values = self.end_values.reshape(-1)
+    
+    # the expected reward plus the discounted, probability weighted, value of the next states
+    np.take(self.start_values.reshape(-1), mdp.next_states, out=next_values)
+    next_values *= arrays['probabilities']
+    np.sum(next_values, axis=1, out=end_values)
+    end_values *= self.discount_factor
+    end_values += arrays['expected_rewards']
+    
+  def in_place_sweep(self):
+    ''' update the end values as the sweep progresses, so later states use the new values of earlier ones
+        - the states are updated in two groups, alternating like the squares of a chessboard
+    '''
+    
+    arrays = self.get_policy_arrays()
+    mdp = arrays['mdp']
+    values = self.end_values.reshape(-1)
+    for states in arrays['colours']:
+      next_values = values[mdp.next_states[states]] * arrays['probabilities'][states]
+      values[states] = arrays['expected_rewards'][states] + self.discount_factor * next_values.sum(axis=1)
+        
   def do_iteration(self):        
-    self.start_values = self.end_values                      # copy the end values into the start values            
-    self.end_values = np.zeros((self.level.height,self.level.width))   # reset the end values        
-    self.standard_sweep()                                    # sweep all states    
+    if self.sweep_mode == 'vectorized':
+      # swap the buffers, so the end values become the start values and the old start values are overwritten
+      self.start_values, self.end_values = self.end_values, self.start_values
+      self.vectorized_sweep()
+    elif self.sweep_mode == 'in_place':
+      # keep a copy of the values from the start of the sweep to measure the change
+      np.copyto(self.start_values, self.end_values)
+      self.in_place_sweep()
+    else:
+      self.start_values = self.end_values                      # copy the end values into the start values            
+      self.end_values = np.zeros((self.level.height,self.level.width))   # reset the end values        
+      self.standard_sweep()                                    # sweep all states    
     self.iterations += 1                                     # increment the iteration count
     
   def run_to_convergence(self, max_iterations = 100, threshold = 1e-3):
@@ -67,6 +143,42 @@ class PolicyEvaluation():
     
     # return the number of iterations taken to converge
     return n
+  
+  def solve(self):
+    ''' calculate the exact state values for the current policy and discount factor by 
+        solving the linear system (I - γP)v = r, rather than sweeping until convergence 
+    '''
+    
+    arrays = self.get_policy_arrays()
+    mdp = arrays['mdp']
+
+    # the sparse solver needs scipy, which is only imported when a large level is solved
+    use_sparse = mdp.num_states > self.dense_solve_limit
+    if use_sparse:
+      try:
+        from sparse_evaluation import get_policy_system, solve_policy_system
+      except ImportError:
+        warnings.warn("scipy isn't installed, so the level is solved with the slower dense solver")
+        use_sparse = False
+
+    if use_sparse:
+      P, r = get_policy_system(self.level, self.policy)
+      values = solve_policy_system(P, r, self.discount_factor)
+    else:
+      # build the dense transition matrix from the probability of moving to each next state
+      P = np.zeros((mdp.num_states,mdp.num_states))
+      rows = np.repeat(np.arange(mdp.num_states)[:,np.newaxis], mdp.num_actions, axis=1)
+      np.add.at(P, (rows, mdp.next_states), arrays['probabilities'])
+      try:
+        values = np.linalg.solve(np.identity(mdp.num_states) - self.discount_factor * P, arrays['expected_rewards'])
+      except np.linalg.LinAlgError:
+        raise ValueError("the policy values can't be solved, check that the exit can be reached from every state")
+    
+    # the values have converged, so are the same at the start and end of an iteration
+    values = values.reshape((self.level.height,self.level.width))
+    np.copyto(self.start_values, values)
+    np.copyto(self.end_values, values)
+    return self.end_values
       
         
   def get_state_value(self,pos):
@@ -158,6 +270,7 @@ class PolicyEvaluation():
   def set_policy(self,policy):
     ''' set the policy to be evaluated '''
     self.policy = policy
+    self.policy_arrays = None
     
     # reset the iterations required to run to convergence on the policy
     self.iterations = 0
@@ -0,0 +1,97 @@
+import numpy as np
+from level_mdp import ACTION_DIRECTIONS
+from policy import Policy
+from policy_evaluation import PolicyEvaluation
+
+
+''' implement the Policy Iteration algorithm '''
+class PolicyIteration():
+
+  def __init__(self, level, discount_factor = 0.9, evaluation_sweeps = None, sweep_mode = 'vectorized', directions = None):
+    self.level = level
+    self.policy = Policy(level)
+    self.policy_evaluation = PolicyEvaluation(level, discount_factor, sweep_mode)
+
+    # the number of evaluation sweeps between each policy improvement
+    # - if not set each policy is evaluated until its values converge
+    # - otherwise this is modified policy iteration, with a fixed number of sweeps per improvement
+    self.evaluation_sweeps = evaluation_sweeps
+
+    # the number of policy improvements and the total number of evaluation sweeps that have been done
+    self.iterations = 0
+    self.evaluation_iterations = 0
+
+    # start from the supplied deterministic policy or from the first available action in each state
+    if directions is None:
+      directions = self.get_initial_directions()
+    self.policy.set_policy(np.array(directions))
+
+  def get_initial_directions(self):
+    ''' get a deterministic policy that takes the first available action in each state '''
+    mdp = self.level.get_mdp()
+    bits = np.array([int(direction) for direction in ACTION_DIRECTIONS])
+    first_action = mdp.actions.argmax(axis=1)
+    directions = np.where(mdp.actions.any(axis=1), bits[first_action], 0)
+    return directions.reshape((self.level.height,self.level.width))
+
+  def get_values(self):
+    return self.policy_evaluation.end_values
+
+  def get_directions(self):
+    return self.policy.get_policy()
+
+  def get_iterations(self):
+    return self.iterations
+
+  def get_evaluation_iterations(self):
+    return self.evaluation_iterations
+
+  def evaluate_policy(self, max_iterations = 100, threshold = 1e-3):
+    ''' evaluate the current policy and return the largest change in a state value over the last sweep
+        - the evaluation starts from the values of the previous policy, rather than from zero
+    '''
+    self.policy_evaluation.set_policy(self.policy.get_policy())
+
+    if self.evaluation_sweeps is None:
+      self.policy_evaluation.run_to_convergence(max_iterations, threshold)
+    else:
+      for _ in range(self.evaluation_sweeps):
+        self.policy_evaluation.do_iteration()
+
+    self.evaluation_iterations += self.policy_evaluation.get_iterations()
+    return np.max(np.abs(self.policy_evaluation.end_values - self.policy_evaluation.start_values))
+
+  def improve_policy(self):
+    ''' act greedily with respect to the current action values and return true if the policy didn't change
+        - where several actions are greedy the action of the previous policy is kept, as long as it's
+          one of them, otherwise the lowest of the greedy direction bits is taken, so that the policy
+          never keeps an action that isn't greedy
+    '''
+    directions = self.policy.get_policy()
+    greedy_directions = self.policy.calculate_greedy_directions(self.policy_evaluation.end_values,
+                                                                self.policy_evaluation.discount_factor)
+
+    # the greedy actions that were also in the previous policy, or all the greedy actions if there are none
+    kept_directions = greedy_directions & directions
+    candidates = np.where(kept_directions != 0, kept_directions, greedy_directions)
+
+    # states without any greedy actions, such as the exit, keep the direction from the previous policy
+    new_directions = np.where(candidates != 0, candidates & -candidates, directions)
+    self.policy.set_policy(new_directions)
+    self.iterations += 1
+    return np.array_equal(directions, new_directions)
+
+  def run_to_convergence(self, max_iterations = 100, evaluation_iterations = 100, threshold = 1e-3):
+    ''' alternate policy evaluation and improvement until the policy stops changing or the
+        maximum number of iterations is reached
+    '''
+    for n in range(max_iterations):
+      delta = self.evaluate_policy(evaluation_iterations, threshold)
+
+      # stop as soon as the greedy policy is the same as the evaluated policy
+      # - with a fixed number of sweeps per improvement the values of the policy must also have converged
+      if self.improve_policy() and (self.evaluation_sweeps is None or delta < threshold):
+        break
+
+    # return the number of iterations taken to converge
+    return n
@@ -0,0 +1,166 @@
+import heapq
+import warnings
+import numpy as np
+
+
+
+''' implement asynchronous Value Iteration, backing up the states in order of their Bellman error '''
+class PrioritizedSweeping():
+
+  policy = None
+
+  def __init__(self,level,discount_factor=0.9,policy=None):
+    self.level = level
+    self.discount_factor = discount_factor
+    self.policy = policy
+    self.reset()
+
+  def reset(self):
+    self.values = None
+
+    # the number of single state backups that have been done
+    self.backups = 0
+
+    # the compiled level that the predecessors were built from
+    self.mdp = None
+
+  def get_initial_values(self):
+    ''' get the values that the states start from, which are below the values they converge to
+        - with discounting no return can be less than the smallest reward divided by (1-γ)
+        - without discounting a path to the exit never needs to visit a state twice, so when moves
+          always reach their target no return is less than the smallest reward times the number of
+          other states (with random moves this is just a low starting value)
+        - starting every state from this bound means that only the states near the exit, whose
+          values are actually known to be higher, have any Bellman error to begin with, and the
+          values then spread out from the exit, rather than being corrected a little at a time
+    '''
+    smallest_reward = min(self.mdp.rewards.min(),0)
+    if self.discount_factor < 1:
+      lower_bound = smallest_reward / (1 - self.discount_factor)
+    else:
+      lower_bound = smallest_reward * (self.mdp.num_states - 1)
+
+    values = np.zeros((self.level.height,self.level.width))
+    values[self.has_actions.reshape(values.shape)] = lower_bound
+    return values
+
+  def get_state_value(self,pos):
+    ''' get the currently calculated value of the specified position in the grid '''
+    x = pos[0]
+    y = pos[1]
+    if (x < 0 or x >= self.level.width) or (y < 0 or y >= self.level.height): return 0
+    return self.values[y,x]
+
+  def get_backups(self):
+    return self.backups
+
+  def get_predecessors(self,mdp,actions):
+    ''' for every state get the states that can move into it and the largest probability, over
+        the allowed actions, of each of these states making that move
+    '''
+    # the largest probability of moving in each direction from each state
+    allowed_probabilities = np.where(actions[:,:,np.newaxis], mdp.probabilities, 0)
+    move_probabilities = allowed_probabilities.max(axis=1)
+
+    # only moves that can actually happen link two states
+    sources, directions = np.nonzero(move_probabilities > 0)
+    targets = mdp.next_states[sources,directions]
+    order = np.argsort(targets, kind='stable')
+
+    probabilities = (self.discount_factor * move_probabilities[sources,directions][order]).tolist()
+    sources = sources[order].tolist()
+    offsets = np.searchsorted(targets[order], np.arange(mdp.num_states+1)).tolist()
+
+    # the predecessors of each state, with the discounted probability of moving from them to the state
+    self.predecessors = [list(zip(sources[start:end],probabilities[start:end]))
+                         for start,end in zip(offsets[:-1],offsets[1:])]
+
+  def setup(self):
+    ''' compile the level into the arrays used to back up single states '''
+    mdp = self.level.get_mdp()
+    if mdp is self.mdp: return
+    self.mdp = mdp
+
+    # only consider the actions that are allowed by the policy
+    if self.policy is None: actions = mdp.actions
+    else: actions = mdp.get_policy_actions(self.policy)
+
+    self.actions = actions & mdp.has_actions[:,np.newaxis]
+    self.has_actions = self.actions.any(axis=1)
+    self.get_predecessors(mdp,self.actions)
+    self.get_transitions(mdp)
+
+  def get_transitions(self,mdp):
+    ''' for every state get the next states that can be reached from it, the reward for moving
+        to each of these and, for each allowed action, the probability of each move
+        - these are kept as lists, since single states are backed up much faster in plain Python
+    '''
+    self.transitions = []
+    for state in range(mdp.num_states):
+      moves = np.flatnonzero(mdp.actions[state])
+      next_states = mdp.next_states[state,moves].tolist()
+      rewards = mdp.rewards[next_states].tolist()
+      probabilities = [mdp.probabilities[state,action,moves].tolist()
+                       for action in np.flatnonzero(self.actions[state])]
+      self.transitions.append((next_states,rewards,probabilities))
+
+  def backup(self,state,values):
+    ''' calculate the value of a single state from the values of its neighbours: v(s) = max[r + γv(s')] '''
+    next_states, rewards, probabilities = self.transitions[state]
+    returns = [reward + self.discount_factor * values[next_state]
+               for next_state,reward in zip(next_states,rewards)]
+    return max(sum(p * g for p,g in zip(action_probabilities,returns))
+               for action_probabilities in probabilities)
+
+  def get_bellman_errors(self,values):
+    ''' calculate the difference between the current and backed up value of every state at once '''
+    action_values = self.mdp.get_action_values(values, self.discount_factor)
+    action_values[~self.actions] = float('-inf')
+    new_values = np.where(self.has_actions, action_values.max(axis=1), 0)
+    return np.abs(new_values - values)
+
+  def run_to_convergence(self, max_backups = 1000000, threshold = 1e-3):
+    ''' back up the state with the largest Bellman error until no state's error can be above the
+        supplied threshold or the maximum number of backups is reached
+        - when a state's value changes the priority of each of its predecessors is increased by
+          the largest amount that the change can alter their backed up value
+        - a warning is given if the maximum number of backups is reached before the values converge
+    '''
+    self.setup()
+    if self.values is None:
+      self.values = self.get_initial_values()
+    values = self.values.ravel().tolist()
+
+    # the priority of each state is an upper bound on its Bellman error
+    # - the queue may hold old entries for a state, these are skipped when their priority is out of date
+    priorities = self.get_bellman_errors(self.values.ravel()).tolist()
+    queue = [(-priority,state) for state,priority in enumerate(priorities) if priority > threshold]
+    heapq.heapify(queue)
+
+    backups = 0
+    while queue and backups < max_backups:
+      priority, state = heapq.heappop(queue)
+      if -priority != priorities[state]:
+        continue
+
+      new_value = self.backup(state,values)
+      delta = abs(new_value - values[state])
+      values[state] = new_value
+      priorities[state] = 0
+      backups += 1
+
+      # push any predecessor whose value may now have changed by more than the threshold
+      for predecessor, probability in self.predecessors[state]:
+        priorities[predecessor] += probability * delta
+        if priorities[predecessor] > threshold:
+          heapq.heappush(queue, (-priorities[predecessor],predecessor))
+
+    self.values = np.array(values).reshape((self.level.height,self.level.width))
+    self.backups += backups
+
+    # the values haven't converged if states were still waiting to be backed up
+    if any(-priority == priorities[state] for priority,state in queue):
+      warnings.warn(f"prioritized sweeping stopped after {max_backups} backups, before the values converged")
+
+    # return the number of backups taken to converge
+    return backups
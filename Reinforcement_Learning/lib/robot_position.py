@@ -2,19 +2,69 @@
 from direction import Direction
 import threading
 from time import sleep, time
+import os
 import random
-
-from ipycanvas import MultiCanvas
-from ipycanvas import Canvas, hold_canvas
-from ipywidgets import Image
-from ipywidgets import Layout
-from ipywidgets import Play, IntProgress, HBox, VBox, link
+import asyncio
+import numpy as np
 
 import logging
 
 logging.basicConfig(level=logging.DEBUG, format='(%(threadName)-9s) %(message)s',)
 
 
+"""
+    Sprite Cache
+"""
+
+# the sprites of each sprite sheet, shared by every robot in the process
+# - keyed by the sheet's path and modification time and by the sprite layout
+sprite_images = {}
+sprite_canvases = {}
+
+def get_sprite_key(file_name, sprite_size, rows, columns):
+    ''' get the cache key of a sprite sheet, which changes if the file is changed '''
+    file_name = os.path.abspath(file_name)
+    return (file_name, os.path.getmtime(file_name), sprite_size, rows, columns)
+
+def get_sprite_images(file_name, sprite_size, rows, columns):
+    ''' get the sprites of a sprite sheet as (sprite_size,sprite_size,4) RGBA arrays
+        - the sheet is only read and decoded the first time that it's used
+        - the sprites are laid out row by row, with a 1 pixel gap between them
+    '''
+    key = get_sprite_key(file_name, sprite_size, rows, columns)
+    if key not in sprite_images:
+        import imageio.v3 as iio
+        sheet = iio.imread(file_name)
+        sprites = []
+        for row in range(rows):
+            for col in range(columns):
+                x = col * (sprite_size + 1)
+                y = row * (sprite_size + 1)
+                sprites.append(np.ascontiguousarray(sheet[y:y+sprite_size, x:x+sprite_size]))
+        sprite_images[key] = sprites
+    return sprite_images[key]
+
+def get_sprite_canvases(file_name, sprite_size, rows, columns):
+    ''' get a canvas holding each sprite of a sprite sheet
+        - the canvases are drawn from the decoded sprites, so don't need to wait for the front end
+    '''
+    from ipycanvas import Canvas
+    key = get_sprite_key(file_name, sprite_size, rows, columns)
+    if key not in sprite_canvases:
+        canvases = []
+        for sprite in get_sprite_images(file_name, sprite_size, rows, columns):
+            canvas = Canvas(width=sprite_size, height=sprite_size)
+            canvas.put_image_data(sprite, 0, 0)
+            canvases.append(canvas)
+        sprite_canvases[key] = canvases
+    return sprite_canvases[key]
+
+def clear_sprite_cache():
+    ''' remove all sprites from the cache, so that they're read again when next used '''
+    sprite_images.clear()
+    sprite_canvases.clear()
+
+
 ''' control robot positioning and drawing '''
 class RobotPosition():
     
@@ -22,6 +72,17 @@ class RobotPosition():
     move_count = 0   
     canvas_sprites = []
 
+    # the layout of the sprites used from the sprite sheet
+    sprite_file = 'images/BabyRobot64_Sprites.png'
+    sprite_rows = 5
+    sprite_columns = 2
+
+    # the task playing the current animation
+    animation = None
+
+    # the position at which the last sprite was drawn, so that it can be removed
+    drawn_position = None
+
     x_offset = 0
     y_offset = 0
     
@@ -29,8 +90,10 @@ class RobotPosition():
                  x_offset = 0, y_offset = 0 ):
         
         self.level = level
-        self.canvas = level.canvases[2]
         self.maze = level.maze
+
+        # a headless level has no canvas, but frames of the robot's movement can still be made
+        self.canvas = None if level.headless else level.canvases[2]
                                 
         self.x = 0
         self.y = 0     
@@ -51,7 +114,8 @@ class RobotPosition():
             self.y_size = y * self.robot_size
                        
         self.sprite_index = initial_sprite        
-        self.load_sprites()              
+        if self.canvas is not None:
+            self.load_sprites()              
         
         if not start_pos:
           self.set_cell_position(level.start)
@@ -71,81 +135,54 @@ class RobotPosition():
       elif len(args) == 2: 
         self.x,self.y = self.level.grid_to_pixels([args[0],args[1]])      
         
-    def get_array(self,*args, **kwargs):                
-        ' callback to split the sprite sheet into individual sprites '        
-
-        # check that the sprites haven't already been created
-        if self.get_number_of_sprites() == 0:
-          for row in range(5):
-            for col in range(2):                                 
-              x = col * (self.robot_size + 1)                    
-              y = row * (self.robot_size + 1)
-            
-              # copy the sprite from the sprite sheet
-              image_data = self.sprite_canvas.get_image_data( x, y, self.robot_size)
-
-              # put the sprite onto its own canvas
-              canvas = Canvas(width=self.robot_size, height=self.robot_size)
-              canvas.put_image_data( image_data, 0, 0 )  
-              self.canvas_sprites.append( canvas )
-        
-        # add a sprite to the display
+    def load_sprites(self):        
+        ' get the sprites from the shared sprite cache and add the robot to the display '        
+        self.canvas_sprites = get_sprite_canvases(self.sprite_file, self.robot_size, 
+                                                  self.sprite_rows, self.sprite_columns)
         self.canvas.clear()
         self.draw()     
-        
-    def load_sprites(self):        
-        ' load the sprite sheet and when loaded callback to split it into individual sprites '        
-        sprites = Image.from_file('images/BabyRobot64_Sprites.png')
-        self.sprite_canvas = Canvas(width=132, height=328, sync_image_data=True)           
-        self.sprite_canvas.draw_image( sprites, 0, 0 )                 
-        self.sprite_canvas.observe(self.get_array, 'image_data')              
             
-    def update_sprite(self):
+    def update_sprite(self, rng = random, number_of_sprites = None):
         ' randomly change to the next sprite '        
+        if number_of_sprites is None: 
+            number_of_sprites = self.get_number_of_sprites()
         self.sprite_count += 1
         if self.sprite_count > self.sprite_change: 
             self.sprite_count = 0   
-            self.sprite_index = self.sprite_index + random.randint(-1,+1)   
+            self.sprite_index = self.sprite_index + rng.randint(-1,+1)   
             if self.sprite_index < 0: 
                 self.sprite_index = 0
-            if self.sprite_index >= self.get_number_of_sprites():
-                self.sprite_index = (self.get_number_of_sprites()-1)    
+            if self.sprite_index >= number_of_sprites:
+                self.sprite_index = (number_of_sprites-1)    
                               
     def draw_sprite(self,index):   
         ' remove the last sprite and add the new one at the current position '
+        if self.canvas is None: return
+        from ipycanvas import hold_canvas
         if self.sprite_index < self.get_number_of_sprites():
             with hold_canvas(self.canvas):
                 x = self.x + self.x_offset
                 y = self.y + self.y_offset
-                self.canvas.clear_rect(x, y, self.robot_size)                        
-                self.canvas.draw_image(self.canvas_sprites[index], x, y )                       
+                self.canvas.clear_rect(x, y, self.robot_size)
+                self.canvas.draw_image(self.canvas_sprites[index], x, y )
+
+                # remember where the sprite is, so the first frame of an animation can remove it
+                self.drawn_position = (x, y)
         
     def draw(self):    
         ' add the current sprite at the current position '     
         self.draw_sprite(self.sprite_index)
         self.update_sprite()               
             
-    def move(self,direction):        
+    def move(self,direction,interval = 0.1):        
         ' move from one square to the next in the specified direction '
         
-        # check that the image sprites have been loaded
-        if self.get_number_of_sprites() > 0:
-            cell = None
-            if self.maze is not None:
-                x, y = self.get_cell_position()
-                cell = self.maze.cell_at( x, y )            
-                if direction == Direction.North and cell.walls['N']: return
-                if direction == Direction.South and cell.walls['S']: return
-                if direction == Direction.East and cell.walls['E']: return
-                if direction == Direction.West and cell.walls['W']: return
-            
-            move_method_name = f"move_{direction.name}"        
-            for _ in range(self.robot_size//self.step):
-                getattr(self,move_method_name)()  
-                self.draw()  
-                sleep(0.10) # pause between each move step        
-                
-            self.move_count += 1
+        # the move is made from the same frames as an animation, so the robot's position and move count
+        # are updated in the same way whether or not it's drawn
+        # - this waits between the frames that are drawn, use 'animate' to move without blocking
+        for frame in self.get_path_frames([direction]):
+            self.draw_frame(frame)
+            if self.canvas is not None: sleep(interval)
         
     def partial_move(self,direction,sprite_index=None):        
         ' move from one square to the next in the specified direction '
@@ -175,4 +212,168 @@ class RobotPosition():
             
     def move_South(self):
         if self.y < (self.y_size - self.robot_size):
-            self.y += self.step
\ No newline at end of file
+            self.y += self.step
+
+
+    """
+        Animation
+    """
+
+    def get_path_frames(self, directions, seed = None):
+        ''' calculate the position and sprite of every step of a move along each of the directions
+            - moves into a wall are skipped, as in 'move'
+            - the sprites are chosen from a random generator with the given seed, so a path always 
+              gives the same frames for the same seed
+            - returns a list of (x, y, sprite_index, end_of_move) tuples, without moving the robot
+        '''
+        rng = random.Random(seed)
+        number_of_sprites = self.sprite_rows * self.sprite_columns
+        state = self.x, self.y, self.sprite_index, self.sprite_count
+
+        frames = []
+        for direction in directions:
+            if self.maze is not None:
+                # the wall bits of the maze match the direction flags
+                x, y = self.get_cell_position()
+                if self.maze.walls[y, x] & direction: continue
+
+            move_method = getattr(self, f"move_{direction.name}")
+            steps = self.robot_size//self.step
+            for step in range(steps):
+                move_method()
+                frames.append((self.x, self.y, self.sprite_index, step == steps-1))
+                self.update_sprite(rng, number_of_sprites)
+
+        self.x, self.y, self.sprite_index, self.sprite_count = state
+        return frames
+
+    def skip_frames(self, frames, frame_step):
+        ''' keep every 'frame_step' frame, for a fast-forward animation, always keeping the final frame '''
+        if frame_step <= 1 or len(frames) == 0: return frames
+        return frames[frame_step-1::frame_step] + ([frames[-1]] if len(frames) % frame_step else [])
+
+    def draw_frame(self, frame):
+        ''' move the robot to the position of the frame and draw its sprite there
+            - without a canvas, such as on a headless level, the robot is moved but not drawn
+        '''
+        self.x, self.y, self.sprite_index, end_of_move = frame
+        if end_of_move: self.move_count += 1
+        if self.canvas is None: return
+        from ipycanvas import hold_canvas
+
+        if self.sprite_index < self.get_number_of_sprites():
+            with hold_canvas(self.canvas):
+                # remove the sprite from where it was last drawn, which may be more than one step away
+                if self.drawn_position is not None:
+                    self.canvas.clear_rect(*self.drawn_position, self.robot_size)
+                self.drawn_position = (self.x + self.x_offset, self.y + self.y_offset)
+                self.canvas.draw_image(self.canvas_sprites[self.sprite_index], *self.drawn_position)
+
+    async def play_frames(self, frames, interval = 0.1):
+        ''' draw each frame in turn, waiting between them without blocking the kernel '''
+        for frame in frames:
+            self.draw_frame(frame)
+            await asyncio.sleep(interval)
+
+    def animate(self, directions, interval = 0.1, frame_step = 1, seed = None):
+        ''' move the robot along the path of directions, drawing its frames in the background
+            - the frames for the whole path are calculated first and then played from an asyncio task, 
+              so the notebook stays responsive while the robot moves
+            - for a fast-forward animation only every 'frame_step' frame is drawn
+            - without a running event loop, such as outside of a notebook, the frames are drawn straight away
+        '''
+        self.stop_animation()
+        frames = self.skip_frames(self.get_path_frames(directions, seed), frame_step)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            for frame in frames: self.draw_frame(frame)
+            return None
+
+        self.animation = loop.create_task(self.play_frames(frames, interval))
+        return self.animation
+
+    def stop_animation(self):
+        ''' stop any animation that's still playing, leaving the robot where it was last drawn '''
+        if self.animation is not None and not self.animation.done():
+            self.animation.cancel()
+        self.animation = None
+
+    def get_sprite_images(self):
+        ''' get the sprites as RGBA arrays, for drawing frames without a canvas '''
+        return get_sprite_images(self.sprite_file, self.robot_size, self.sprite_rows, self.sprite_columns)
+
+    def get_level_image(self):
+        ''' draw a plain image of the level, with its grid, start, exit and walls, as an RGB array '''
+        level = self.level
+        cell, padding = level.cell_pixels, level.padding
+        image = np.zeros((level.height_pixels, level.width_pixels, 3), dtype=np.uint8)
+        image[:] = (255, 165, 0)
+
+        def fill_cell(pos, color):
+            x, y = level.grid_to_pixels(pos)
+            image[y:y+cell, x:x+cell] = color
+
+        # the grid lines
+        image[padding::cell, :] = (119, 119, 119)
+        image[:, padding::cell] = (119, 119, 119)
+
+        if level.fill_center:
+            for y in range(1, level.height-1):
+                for x in range(1, level.width-1):
+                    fill_cell([x, y], (255, 255, 255))
+        fill_cell(level.start, (237, 24, 24))
+        fill_cell(level.end, (0, 128, 0))
+
+        # the south and east walls of each cell, which together with the border give all the walls
+        wall = 2
+        if level.maze is not None:
+            for y, x in zip(*np.nonzero(level.maze.walls & Direction.South)):
+                px, py = level.grid_to_pixels([x, y+1])
+                image[max(py-wall, 0):py+wall, max(px-wall, 0):px+cell+wall] = 0
+            for y, x in zip(*np.nonzero(level.maze.walls & Direction.East)):
+                px, py = level.grid_to_pixels([x+1, y])
+                image[max(py-wall, 0):py+cell+wall, max(px-wall, 0):px+wall] = 0
+
+        # the level border
+        image[:padding+wall, :] = 0
+        image[-(padding+wall):, :] = 0
+        image[:, :padding+wall] = 0
+        image[:, -(padding+wall):] = 0
+        return image
+
+    def render_frames(self, frames, background = None):
+        ''' draw each frame onto a copy of the background image, without using a canvas
+            - returns a list of RGB arrays
+        '''
+        if background is None: 
+            background = self.get_level_image()
+        sprites = self.get_sprite_images()
+        height, width = background.shape[:2]
+
+        images = []
+        for x, y, sprite_index, _ in frames:
+            image = background.copy()
+
+            # alpha blend the sprite onto the part of the image that it covers
+            x, y = x + self.x_offset, y + self.y_offset
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + self.robot_size, width), min(y + self.robot_size, height)
+            if x0 < x1 and y0 < y1:
+                sprite = sprites[sprite_index][y0-y:y1-y, x0-x:x1-x]
+                alpha = sprite[..., 3:] / 255
+                area = image[y0:y1, x0:x1]
+                area[:] = (sprite[..., :3] * alpha + area * (1 - alpha)).astype(np.uint8)
+            images.append(image)
+        return images
+
+    def save_gif(self, directions, file_name, interval = 0.1, frame_step = 1, seed = None):
+        ''' write an animated GIF of the robot moving along the path of directions
+            - this doesn't need a canvas, so can be used with a headless level
+            - for a fast-forward animation only every 'frame_step' frame is saved
+        '''
+        import imageio.v3 as iio
+        frames = self.skip_frames(self.get_path_frames(directions, seed), frame_step)
+        images = self.render_frames(frames)
+        iio.imwrite(file_name, np.stack(images), duration=int(interval * 1000), loop=0)
+        return len(images)
@@ -0,0 +1,113 @@
+import warnings
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse.linalg import spsolve, MatrixRankWarning
+
+
+def get_policy_system(level, policy=None):
+  ''' get the sparse transition matrix and expected reward vector of a policy on the level
+      - P[s,s'] is the probability of moving from state 's' to state 's'' under the policy
+      - r[s] is the expected reward of moving from state 's'
+      - with no policy all available actions are equally likely
+  '''
+  mdp = level.get_mdp()
+  probabilities = mdp.get_policy_probabilities(policy)
+
+  # each state has an entry for each of its possible next states
+  # - moves that can't happen have zero probability and are removed
+  rows = np.repeat(np.arange(mdp.num_states), mdp.num_actions)
+  P = sparse.csr_matrix((probabilities.ravel(), (rows, mdp.next_states.ravel())),
+                        shape=(mdp.num_states, mdp.num_states))
+  P.eliminate_zeros()
+
+  r = mdp.get_expected_rewards(probabilities)
+  return P, r
+
+
+def solve_policy_system(P, r, discount_factor):
+  ''' solve the linear system (I - γP)v = r to get the exact state values of a policy '''
+
+  A = sparse.identity(P.shape[0], format='csc') - discount_factor * P.tocsc()
+  with warnings.catch_warnings():
+    warnings.simplefilter('ignore', MatrixRankWarning)
+    values = spsolve(A, r)
+
+  # without discounting a policy that never reaches the exit has no finite values
+  if not np.all(np.isfinite(values)):
+    raise ValueError("the policy values can't be solved, check that the exit can be reached from every state")
+  return values
+
+
+''' evaluate a policy using sparse matrices '''
+class SparsePolicyEvaluation():
+
+  iterations = 0
+  policy = None
+  discount_factor = 1
+
+  # the sparse transition matrix and reward vector of the policy, created when first required
+  system = None
+
+  def __init__(self,level,discount_factor = 1):
+    self.level = level
+    self.discount_factor = discount_factor
+    self.reset()
+
+  def reset(self):
+    self.iterations = 0
+    self.start_values = np.zeros((self.level.height,self.level.width))
+    self.end_values = np.zeros((self.level.height,self.level.width))
+
+  def get_iterations(self):
+    return self.iterations
+
+  def get_system(self):
+    ''' get the transition matrix and reward vector of the current policy '''
+    mdp = self.level.get_mdp()
+    if self.system is None or self.system[0] is not mdp:
+      P, r = get_policy_system(self.level, self.policy)
+      self.system = (mdp, P, r)
+    return self.system[1], self.system[2]
+
+  def do_iteration(self):
+    ''' calculate all state values with a single sparse matrix-vector product '''
+    P, r = self.get_system()
+    self.start_values = self.end_values
+    end_values = r + self.discount_factor * P.dot(self.start_values.ravel())
+    self.end_values = end_values.reshape((self.level.height,self.level.width))
+    self.iterations += 1
+
+  def run_to_convergence(self, max_iterations = 100, threshold = 1e-3):
+    ''' run until the values stop changing '''
+    for n in range(max_iterations):
+      self.do_iteration()
+
+      # calculate the largest difference in the state values from the start to end of the iteration
+      delta = np.max(np.abs(self.end_values - self.start_values))
+
+      # test if the difference is less than the defined convergence threshold
+      if delta < threshold:
+        break
+
+    # return the number of iterations taken to converge
+    return n
+
+  def solve(self):
+    ''' calculate the exact state values with a direct sparse linear solve '''
+    P, r = self.get_system()
+    values = solve_policy_system(P, r, self.discount_factor)
+    self.start_values = self.end_values
+    self.end_values = values.reshape((self.level.height,self.level.width))
+    return self.end_values
+
+  def set_policy(self,policy):
+    ''' set the policy to be evaluated '''
+    self.policy = policy
+    self.system = None
+
+    # reset the iterations required to run to convergence on the policy
+    self.iterations = 0
+
+  def set_discount_factor(self, discount_factor):
+    ''' set the discount factor to apply to the future rewards '''
+    self.discount_factor = discount_factor
@@ -8,11 +8,15 @@ class ValueIteration():
   
   policy = None
     
-  def __init__(self,level,discount_factor=0.9):
+  def __init__(self,level,discount_factor=0.9,sweep_mode='standard'):
     self.level = level        
     self.values = np.zeros((level.height,level.width))
     self.discount_factor = discount_factor       
     
+    # 'standard' - calculate the value of each state in turn
+    # 'vectorized' - calculate the values of all states at once from the compiled level
+    self.sweep_mode = sweep_mode
+    
   def get_state_value(self,pos):
     ''' get the currently calculated value of the specified position in the grid '''
     x = pos[0]
@@ -79,8 +83,8 @@ class ValueIteration():
     return max_value  
   
 
-  def state_sweep(self):
-    ''' calculate the value of all states except the exit '''
+  def standard_sweep(self):
+    ''' calculate the value of each state, except the exit, in turn '''
     
     new_values = np.zeros((self.level.height,self.level.width))
     end = self.level.get_end()    
@@ -88,6 +92,33 @@ class ValueIteration():
       for x in range(self.level.width):
         if (x != end[0]) or (y != end[1]):
           new_values[y,x] = self.calculate_max_action_value(x,y)    
+    return new_values
+  
+
+  def vectorized_sweep(self):
+    ''' calculate the values of all states at once, as the maximum over the action axis '''
+    
+    mdp = self.level.get_mdp()
+    action_values = mdp.get_action_values(self.values, self.discount_factor)
+    
+    # only consider the actions that are allowed by the policy
+    if self.policy is None: actions = mdp.actions
+    else: actions = mdp.get_policy_actions(self.policy)    
+    action_values[~actions] = float('-inf')
+    new_values = action_values.max(axis=1)
+    
+    # states without any actions, such as the exit, have a value of zero
+    new_values[~mdp.has_actions] = 0
+    return new_values.reshape((self.level.height,self.level.width))
+  
+
+  def state_sweep(self):
+    ''' calculate the value of all states except the exit '''
+    
+    if self.sweep_mode == 'vectorized':
+      new_values = self.vectorized_sweep()
+    else:
+      new_values = self.standard_sweep()
 
     # calculate the largest difference in the state values between the start and end of the sweep
     delta = np.max(np.abs(new_values - self.values))           
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the library modules import each other by name, so the tests import them from the 'lib' directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from grid_level import GridLevel
+
+
+class RecordingCanvas():
+  ''' a stand-in for an ipycanvas canvas that just counts the drawing calls made on it '''
+
+  def __init__(self):
+    self.calls = []
+
+  def __getattr__(self, name):
+    return lambda *args, **kwargs: self.calls.append(name)
+
+
+def test_text_over_arrows_redraws_arrows():
+  ''' check that drawing text in a cell, which erases the middle of its arrows, means the arrows are drawn again '''
+  level = GridLevel(4,3,headless=True)
+  canvas = RecordingCanvas()
+
+  level.draw_directions(canvas, 1, 1, [1,2], '#00008b')
+  level.draw_cell_text(canvas, 1, 1, "0.5", '#fff', None)
+  canvas.calls.clear()
+
+  level.draw_directions(canvas, 1, 1, [1,2], '#00008b')
+  assert canvas.calls
+
+  # with nothing drawn over them, the same arrows are skipped
+  canvas.calls.clear()
+  level.draw_directions(canvas, 1, 1, [1,2], '#00008b')
+  assert not canvas.calls
+
+
+def test_redraw_after_clearing_area():
+  ''' check that cells are drawn again after an area of the values canvas that covers them is cleared '''
+  level = GridLevel(4,3,headless=True)
+  canvas = RecordingCanvas()
+  level.headless = False
+  level.canvases = [RecordingCanvas() for _ in range(3)] + [canvas]
+
+  level.draw_cell_text(canvas, 0, 1, "0.5", '#fff', None)
+  level.draw_cell_text(canvas, 0, 3, "0.5", '#fff', None)
+  level.draw_directions(canvas, 1, 0, [2], '#00008b')
+
+  # clear the cells in the first two columns, leaving the last column
+  level.clear_values_area(0, 0, 2*level.cell_pixels, level.height_pixels)
+  canvas.calls.clear()
+
+  level.draw_cell_text(canvas, 0, 1, "0.5", '#fff', None)
+  level.draw_directions(canvas, 1, 0, [2], '#00008b')
+  assert canvas.calls.count('fill_text') == 1
+  assert 'clear_rect' in canvas.calls and len(canvas.calls) > 5
+
+  canvas.calls.clear()
+  level.draw_cell_text(canvas, 0, 3, "0.5", '#fff', None)
+  assert not canvas.calls
+
+
+def test_redraw_level_draws_all_cells():
+  ''' check that redrawing the level, which creates new canvases, forgets everything drawn on the old ones '''
+  pytest.importorskip('ipycanvas')
+  level = GridLevel(4,3)
+  level.show_values(np.ones((3,4)))
+  assert level.drawn_text
+
+  level.setup_canvases(False)
+  assert not level.drawn_text and not level.drawn_directions
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from grid_level import GridLevel
+from level_io import save_level, read_level, load_level
+from maze import Maze
+
+
+def splash_level(level, seed):
+  level.add_splashes(np.random.default_rng(seed).integers(0,3,(level.height,level.width)).tolist())
+  return level
+
+levels = {
+  'plain': lambda: GridLevel(4,3,headless=True),
+  'maze': lambda: GridLevel(12,9,add_maze=True,maze_seed=3,headless=True),
+  'maze with splashes': lambda: splash_level(GridLevel(10,10,add_maze=True,maze_seed=4,end=[5,5],headless=True), 4),
+}
+
+
+def load_level_into_memory(file_name):
+  ''' create a grid level from copies of the grids of a level file, rather than from the memory-mapped file '''
+  settings = read_level(file_name)
+  level = GridLevel(settings['width'], settings['height'], start = settings['start'], end = settings['end'],
+                    fill_center = settings['fill_center'], headless = True)
+  if settings['walls'] is not None:
+    level.set_maze(Maze.from_walls(np.array(settings['walls']), *settings['start']))
+  if settings['splashes'] is not None:
+    level.add_splashes(np.array(settings['splashes']))
+  return level
+
+
+@pytest.mark.parametrize('name', levels)
+@pytest.mark.parametrize('load', [lambda file_name: load_level(file_name, headless = True), load_level_into_memory],
+                         ids=['memmap', 'memory'])
+def test_level_round_trip(tmp_path, name, load):
+  ''' check that a saved and reloaded level has the same walls, actions and compiled arrays '''
+  level = levels[name]()
+  file_name = str(tmp_path / 'level.bin')
+  save_level(level, file_name)
+  loaded = load(file_name)
+
+  assert (loaded.width, loaded.height) == (level.width, level.height)
+  assert list(loaded.start) == list(level.start) and list(loaded.end) == list(level.end)
+  if level.maze is None:
+    assert loaded.maze is None
+  else:
+    np.testing.assert_array_equal(loaded.maze.walls, level.maze.walls)
+  np.testing.assert_array_equal(loaded.get_puddle_sizes(), level.get_puddle_sizes())
+
+  for y in range(level.height):
+    for x in range(level.width):
+      assert loaded.get_available_actions(x,y) == level.get_available_actions(x,y)
+
+  mdp, loaded_mdp = level.get_mdp(), loaded.get_mdp()
+  for attribute in ('actions', 'next_states', 'rewards', 'probabilities'):
+    np.testing.assert_array_equal(getattr(loaded_mdp, attribute), getattr(mdp, attribute))
+
+
+def test_read_level_rejects_other_files(tmp_path):
+  file_name = tmp_path / 'other.bin'
+  file_name.write_bytes(b'not a level file at all')
+  with pytest.raises(ValueError):
+    read_level(str(file_name))
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from maze import Maze
+
+
+@pytest.mark.parametrize('algorithm', Maze.algorithms)
+def test_make_maze_keeps_cell_views(algorithm):
+  ''' check that making a maze updates the wall array in place, so that existing cells see the new walls '''
+  maze = Maze(5, 5, seed = 1)
+  walls = maze.walls
+  cell = maze.cell_at(2, 2)
+
+  maze.make_maze(algorithm)
+
+  assert maze.walls is walls
+  assert dict(cell.walls) == {wall: maze.has_wall(2, 2, wall) for wall in 'NESW'}
+  assert not np.all(maze.walls == 15)
@@ -0,0 +1,46 @@
+import numpy as np
+
+from grid_level import GridLevel
+from policy import Policy
+from policy_iteration import PolicyIteration
+
+
+def test_update_policy_ties_keep_previous_direction():
+  ''' check that a state with tied greedy actions keeps its previous direction, as in the cell by cell version,
+      and that a state with a single greedy action takes that action '''
+  level = GridLevel(4,3,headless=True)
+  values = np.random.default_rng(1).integers(0,2,(3,4)).astype(float)
+  previous = np.full((3,4), 8)
+
+  policy = Policy(level)
+  policy.set_policy(previous.copy())
+  directions = policy.update_policy(values)
+
+  end = level.get_end()
+  for y in range(3):
+    for x in range(4):
+      greedy = 0 if [x,y] == list(end) else policy.calculate_cell_directions(x,y,values)
+      single = greedy != 0 and (greedy & (greedy-1)) == 0
+      assert directions[y,x] == (greedy if single else previous[y,x])
+
+
+def test_policy_iteration_ties_keep_greedy_direction():
+  ''' check that policy improvement only keeps the previous direction of a state when it's one of the tied
+      greedy actions, and otherwise takes the lowest greedy direction '''
+  level = GridLevel(4,3,headless=True)
+  policy_iteration = PolicyIteration(level)
+  policy_evaluation = policy_iteration.policy_evaluation
+  policy_evaluation.end_values[:] = 0.
+
+  # every state points West, which is only one of the tied greedy actions in some of the states
+  previous = np.full((3,4), 8)
+  policy_iteration.policy.set_policy(previous.copy())
+  greedy = policy_iteration.policy.calculate_greedy_directions(policy_evaluation.end_values,
+                                                               policy_evaluation.discount_factor)
+  assert np.any((greedy & previous) != 0) and np.any((greedy != 0) & ((greedy & previous) == 0))
+
+  policy_iteration.improve_policy()
+  directions = policy_iteration.get_directions()
+  lowest = greedy & -greedy
+  expected = np.where(greedy & previous, previous, np.where(greedy != 0, lowest, previous))
+  np.testing.assert_array_equal(directions, expected)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from grid_level import GridLevel
+from policy_evaluation import PolicyEvaluation
+from policy_iteration import PolicyIteration
+
+
+@pytest.mark.parametrize('sweep_mode', ['vectorized', 'in_place'])
+def test_policy_changed_in_place(sweep_mode):
+  ''' check that changing the policy array in place, between evaluations, evaluates the new policy '''
+  level = GridLevel(4,3,headless=True)
+  policy_iteration = PolicyIteration(level)
+  policy_iteration.run_to_convergence()
+  directions = policy_iteration.get_directions().copy()
+
+  policy_evaluation = PolicyEvaluation(level, 0.9, sweep_mode)
+  policy_evaluation.set_policy(directions)
+  policy_evaluation.run_to_convergence(max_iterations = 1000, threshold = 1e-9)
+
+  # point the state next to the exit away from it and evaluate again, without setting the policy
+  directions[2,2] = 8
+  policy_evaluation.run_to_convergence(max_iterations = 1000, threshold = 1e-9)
+
+  expected = PolicyEvaluation(level, 0.9, sweep_mode)
+  expected.set_policy(directions.copy())
+  expected.run_to_convergence(max_iterations = 1000, threshold = 1e-9)
+  np.testing.assert_allclose(policy_evaluation.end_values, expected.end_values)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from grid_level import GridLevel
+from policy import Policy
+from policy_iteration import PolicyIteration
+from value_iteration import ValueIteration
+
+
+def splash_level(level, seed):
+  level.add_splashes(np.random.default_rng(seed).integers(0,3,(level.height,level.width)).tolist())
+  return level
+
+levels = {
+  'plain': lambda: GridLevel(4,3,headless=True),
+  'maze': lambda: GridLevel(10,10,add_maze=True,maze_seed=3,headless=True),
+  'splash': lambda: splash_level(GridLevel(8,6,headless=True), 2),
+  'maze with splashes': lambda: splash_level(GridLevel(10,10,add_maze=True,maze_seed=4,headless=True), 4),
+}
+
+
+@pytest.mark.parametrize('name', levels)
+@pytest.mark.parametrize('evaluation_sweeps', [None, 1, 3])
+def test_policy_iteration(name, evaluation_sweeps, discount_factor = 0.9, threshold = 1e-9, tolerance = 1e-6):
+  ''' check that policy iteration, and modified policy iteration, find the same values as value
+      iteration and a policy that only takes its greedy actions '''
+  level = levels[name]()
+
+  value_iteration = ValueIteration(level, discount_factor, sweep_mode='vectorized')
+  value_iteration.run_to_convergence(max_iterations = 10000, threshold = threshold)
+  greedy_directions = Policy(level).calculate_greedy_directions(value_iteration.values, discount_factor)
+
+  policy_iteration = PolicyIteration(level, discount_factor, evaluation_sweeps)
+  policy_iteration.run_to_convergence(max_iterations = 10000, evaluation_iterations = 10000, threshold = threshold)
+  directions = policy_iteration.get_directions()
+
+  assert np.all((directions & greedy_directions) == directions)
+  assert np.max(np.abs(policy_iteration.get_values() - value_iteration.values)) <= tolerance
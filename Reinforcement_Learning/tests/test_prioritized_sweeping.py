@@ -0,0 +1,47 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from grid_level import GridLevel
+from prioritized_sweeping import PrioritizedSweeping
+from value_iteration import ValueIteration
+
+
+def splash_level(level, seed):
+  level.add_splashes(np.random.default_rng(seed).integers(0,3,(level.height,level.width)).tolist())
+  return level
+
+levels = {
+  'plain': lambda: GridLevel(4,3,headless=True),
+  'maze': lambda: GridLevel(40,40,add_maze=True,maze_seed=1,headless=True),
+  'splash': lambda: splash_level(GridLevel(8,6,headless=True), 2),
+  'maze with splashes': lambda: splash_level(GridLevel(10,10,add_maze=True,maze_seed=4,headless=True), 4),
+}
+
+
+@pytest.mark.parametrize('name', levels)
+@pytest.mark.parametrize('discount_factor', [0.9, 1])
+def test_prioritized_sweeping(name, discount_factor, threshold = 1e-9, tolerance = 1e-6):
+  ''' check that prioritized sweeping converges to the same values as value iteration '''
+  level = levels[name]()
+
+  value_iteration = ValueIteration(level, discount_factor, sweep_mode='vectorized')
+  iterations = value_iteration.run_to_convergence(max_iterations = 100000, threshold = threshold)
+
+  prioritized_sweeping = PrioritizedSweeping(level, discount_factor)
+  with warnings.catch_warnings():
+    warnings.simplefilter('error')
+    backups = prioritized_sweeping.run_to_convergence(threshold = threshold)
+
+  assert np.max(np.abs(prioritized_sweeping.values - value_iteration.values)) <= tolerance
+
+  # on a maze, where the moves always reach their target, far fewer states are backed up than are swept
+  if name == 'maze':
+    assert backups < iterations * level.width * level.height / 10
+
+
+def test_warning_when_not_converged():
+  level = GridLevel(20,20,add_maze=True,maze_seed=1,headless=True)
+  with pytest.warns(UserWarning):
+    PrioritizedSweeping(level, 1).run_to_convergence(max_backups = 50)
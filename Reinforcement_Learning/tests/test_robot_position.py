@@ -0,0 +1,33 @@
+from direction import Direction
+from grid_level import GridLevel
+from robot_position import RobotPosition
+
+
+def test_animate_headless():
+  ''' check that animating a robot on a headless level moves it and counts its moves '''
+  level = GridLevel(4,3,headless=True)
+  robot = RobotPosition(level)
+  frames = robot.get_path_frames([Direction.East, Direction.South], seed = 1)
+
+  robot.animate([Direction.East, Direction.South], seed = 1)
+
+  assert (robot.x, robot.y) == frames[-1][:2]
+  assert robot.move_count == 2
+
+
+def test_move_headless():
+  ''' check that moving a robot on a headless level moves it in the same way as an animation, without waiting '''
+  level = GridLevel(4,3,add_maze=True,maze_seed=1,headless=True)
+  robot = RobotPosition(level)
+  animated = RobotPosition(level)
+  directions = [Direction.East, Direction.South, Direction.East, Direction.North]
+
+  for direction in directions: robot.move(direction)
+  animated.animate(directions)
+
+  assert robot.get_cell_position() == animated.get_cell_position()
+  assert robot.move_count == animated.move_count
+
+  # the moves South and North run into walls of the maze, so only the moves East are made
+  assert robot.get_cell_position() == (2,0)
+  assert robot.move_count == 2